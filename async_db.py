@@ -1,30 +1,273 @@
 import asyncio
 import json
+import time
 import datetime
 import logging
-from typing import List, Dict, Optional, Any
+from dataclasses import dataclass
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 import asyncpg
 from asyncpg.pool import Pool
 
 from config import MIN_STEP
+from ban_index import BanIndex
+from lot_cache import LotCache
+from statements import StatementRegistry
+from user_buffer import UserWriteBuffer
 
 logger = logging.getLogger(__name__)
 
+# Канал уведомлений об изменении строк lots (триггер в init_tables)
+LOT_CHANGED_CHANNEL = "lot_changed"
+LISTENER_RETRY_DELAY = 5
+# Сколько секунд считать актуальным число лотов для меню
+LOT_COUNT_TTL = 10.0
+# Ключ сортировки списков лотов (совпадает с выражением индекса idx_lots_browse)
+LOT_BROWSE_KEY = "COALESCE(start_time, 'infinity'::timestamp)"
+# Статусы, которые покрывает частичный индекс idx_lots_browse
+BROWSE_STATUSES = ("pending", "active")
+
+# Горячие запросы, по которым ведётся статистика (statements.py)
+HOT_STATEMENTS = {
+    "get_lot": "SELECT * FROM lots WHERE auction_id = $1",
+    "get_user": "SELECT * FROM users WHERE user_id = $1",
+    "upsert_user": """\
+INSERT INTO users (user_id, user_name)
+VALUES ($1, $2)
+ON CONFLICT (user_id) DO UPDATE SET user_name = EXCLUDED.user_name\
+    """,
+    "get_last_bid": """\
+SELECT user_id, amount, created_at
+FROM bids
+WHERE auction_id = $1
+ORDER BY amount DESC, created_at DESC
+LIMIT 1\
+    """,
+    "get_participants": "SELECT user_id FROM lot_participants WHERE auction_id = $1",
+    "update_current_price": "UPDATE lots SET current_price = $1 WHERE auction_id = $2",
+    # Строка лота блокируется FOR UPDATE, поэтому конкурирующие ставки
+    # проверяются по уже обновлённой current_price, а не по снимку. Лидер берётся
+    # из той же строки (leader_user_id): bids в этом запросе видны только по снимку
+    # до блокировки, и предыдущий лидер из них был бы устаревшим.
+    "place_bid": """\
+WITH lot AS (
+    SELECT auction_id, name, status, current_price, end_time, leader_user_id
+    FROM lots
+    WHERE auction_id = $1
+    FOR UPDATE
+),
+usr AS (
+    SELECT banned_until FROM users WHERE user_id = $2
+),
+checked AS (
+    SELECT lot.*,
+           (SELECT banned_until FROM usr WHERE banned_until > NOW()) AS banned_until,
+           CASE
+               WHEN EXISTS (SELECT 1 FROM usr WHERE banned_until > NOW()) THEN 'banned'
+               WHEN lot.status <> 'active'
+                    OR (lot.end_time IS NOT NULL AND lot.end_time <= NOW()) THEN 'inactive'
+               WHEN $3::numeric < lot.current_price + $4::numeric THEN 'too_low'
+               ELSE 'accepted'
+           END AS outcome
+    FROM lot
+),
+inserted AS (
+    INSERT INTO bids (auction_id, user_id, amount)
+    SELECT $1, $2, $3 FROM checked WHERE outcome = 'accepted'
+    ON CONFLICT (auction_id, user_id, amount) DO NOTHING
+    RETURNING auction_id
+),
+participant AS (
+    INSERT INTO lot_participants (auction_id, user_id)
+    SELECT $1, $2 FROM inserted
+    ON CONFLICT DO NOTHING
+),
+updated AS (
+    UPDATE lots
+    SET current_price = $3,
+        leader_user_id = $2,
+        end_time = CASE
+            WHEN lots.end_time IS NOT NULL AND lots.end_time - NOW() < $5::interval
+            THEN NOW() + $6::interval
+            ELSE lots.end_time
+        END,
+        last_updated = NOW()
+    FROM inserted
+    WHERE lots.auction_id = inserted.auction_id
+    RETURNING lots.current_price, lots.end_time
+)
+SELECT checked.outcome, checked.name, checked.banned_until,
+       checked.leader_user_id AS previous_leader_id,
+       COALESCE(updated.current_price, checked.current_price) AS current_price,
+       COALESCE(updated.end_time, checked.end_time) AS end_time,
+       updated.end_time IS DISTINCT FROM checked.end_time AND updated.end_time IS NOT NULL AS extended,
+       EXISTS (SELECT 1 FROM inserted) AS inserted
+FROM checked
+LEFT JOIN updated ON TRUE\
+    """,
+}
+
+# Лидер лотов по истории ставок (для баз, созданных до появления leader_user_id)
+BACKFILL_LEADERS = """\
+UPDATE lots l SET leader_user_id = b.user_id
+FROM (
+    SELECT DISTINCT ON (auction_id) auction_id, user_id
+    FROM bids
+    ORDER BY auction_id, amount DESC, created_at DESC
+) b
+WHERE l.auction_id = b.auction_id\
+"""
+
+# Заполнение lot_participants по уже сделанным ставкам
+BACKFILL_PARTICIPANTS = """\
+INSERT INTO lot_participants (auction_id, user_id)
+SELECT DISTINCT auction_id, user_id FROM bids WHERE auction_id IS NOT NULL
+ON CONFLICT DO NOTHING\
+"""
+
+
+class BidStatus(str, Enum):
+    """Итог попытки сделать ставку"""
+    ACCEPTED = "accepted"
+    TOO_LOW = "too_low"
+    INACTIVE = "inactive"
+    BANNED = "banned"
+    NOT_FOUND = "not_found"
+
+
+@dataclass
+class BidResult:
+    """Результат add_bid_transaction: статус, актуальная цена и время окончания лота"""
+    status: BidStatus
+    current_price: Optional[float] = None
+    end_time: Optional[datetime.datetime] = None
+    extended: bool = False
+    lot_name: Optional[str] = None
+    banned_until: Optional[datetime.datetime] = None
+    previous_leader_id: Optional[int] = None
+
+    @property
+    def accepted(self) -> bool:
+        return self.status is BidStatus.ACCEPTED
+
+
+@dataclass
+class LotPage:
+    """Страница списка лотов и есть ли страницы до и после неё"""
+    lots: List[Dict]
+    has_prev: bool = False
+    has_next: bool = False
+
+
 class AsyncDatabase:
-    def __init__(self, db_uri: str):
+    def __init__(self, db_uri: str, lot_cache_size: int = 1000, lot_cache_ttl: float = 30.0):
         self.db_uri = db_uri
         self.pool: Optional[Pool] = None
+        # Число запросов к БД (включая BEGIN/COMMIT) — для нагрузочных замеров
+        self.queries = 0
+        self.statements = StatementRegistry()
+        for name, query in HOT_STATEMENTS.items():
+            self.statements.register(name, query)
+        # Кэш лотов: свои записи обновляют его сразу, чужие (другие экземпляры,
+        # правки в SQL) сбрасывают через LISTEN/NOTIFY. Без слушателя кэш не используется.
+        self.lot_cache = LotCache(lot_cache_size, lot_cache_ttl)
+        self._listener: Optional[asyncpg.Connection] = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._own_pids = set()
+        # Подписчики на чужие изменения лотов: вызываются с auction_id или None («всё»)
+        self._lot_listeners: List[Callable[[Optional[int]], None]] = []
+        # Действующие баны в памяти: проверка при ставке без запроса к БД
+        self.bans = BanIndex()
+        # Регистрация пользователей из /start и входа в аукцион пишется пакетами
+        self.user_buffer = UserWriteBuffer(self.upsert_users)
+        # Число лотов по набору статусов: (момент подсчёта, значение)
+        self._lot_counts: Dict[Tuple[str, ...], Tuple[float, int]] = {}
+
+    def _count_query(self, record):
+        self.queries += 1
+
+    async def _setup_connection(self, connection: asyncpg.Connection):
+        connection.add_query_logger(self._count_query)
+        pid = connection.get_server_pid()
+        self._own_pids.add(pid)
+        connection.add_termination_listener(lambda conn: self._own_pids.discard(pid))
+
+    def add_lot_listener(self, callback: Callable[[Optional[int]], None]):
+        """Подписка на изменения лотов из других экземпляров (и на потерю подписки)"""
+        self._lot_listeners.append(callback)
+
+    def _notify_lot_listeners(self, auction_id: Optional[int]):
+        for callback in self._lot_listeners:
+            try:
+                callback(auction_id)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработчика изменения лота {auction_id}: {e}")
+
+    def _on_lot_changed(self, connection, pid: int, channel: str, payload: str):
+        # Свои изменения уже отражены в кэше при записи
+        if pid in self._own_pids:
+            return
+        try:
+            auction_id = int(payload)
+        except ValueError:
+            auction_id = None
+        if auction_id is None:
+            self.lot_cache.clear()
+        else:
+            self.lot_cache.invalidate(auction_id)
+        self._notify_lot_listeners(auction_id)
+
+    def _on_listener_lost(self, connection):
+        # Пока слушателя нет, чужие изменения не видны — кэш сбрасываем и не используем
+        self._listener = None
+        self.lot_cache.clear()
+        if self.pool is not None and (self._listener_task is None or self._listener_task.done()):
+            self._listener_task = asyncio.create_task(self._connect_listener())
+
+    async def _connect_listener(self):
+        while self.pool is not None:
+            try:
+                listener = await asyncpg.connect(self.db_uri)
+                await listener.add_listener(LOT_CHANGED_CHANNEL, self._on_lot_changed)
+                listener.add_termination_listener(self._on_listener_lost)
+                self.lot_cache.clear()
+                reconnected = self._listener_task is not None
+                self._listener = listener
+                if reconnected:
+                    # Пока подписки не было, изменения могли пройти мимо
+                    self._notify_lot_listeners(None)
+                return
+            except Exception as e:
+                logger.warning(f"⚠️ Нет подписки на изменения лотов, кэш отключён: {e}")
+                await asyncio.sleep(LISTENER_RETRY_DELAY)
 
     async def initialize(self):
         """Инициализация пула соединений"""
-        self.pool = await asyncpg.create_pool(self.db_uri, min_size=5, max_size=20)
+        self.pool = await asyncpg.create_pool(self.db_uri, min_size=5, max_size=20,
+                                              init=self._setup_connection)
         await self.init_tables()
+        await self._connect_listener()
+        await self.load_bans()
+        self.user_buffer.start()
         logger.info("✅ Database pool initialized")
 
     async def close(self):
         """Закрытие пула соединений"""
+        try:
+            await self.user_buffer.close()
+        except Exception as e:
+            logger.error(f"❌ Не удалось записать {len(self.user_buffer.pending)} пользователей: {e}")
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            await asyncio.gather(self._listener_task, return_exceptions=True)
+            self._listener_task = None
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            await listener.close()
         if self.pool:
-            await self.pool.close()
+            pool, self.pool = self.pool, None
+            await pool.close()
             logger.info("✅ Database pool closed")
 
     async def execute(self, query: str, *args):
@@ -82,6 +325,14 @@ CREATE TABLE IF NOT EXISTS bids (
     amount DECIMAL(10,2),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(auction_id, user_id, amount)
+)\
+            """,
+            # Участники лота: по строке на пару (лот, пользователь), пополняется при ставке
+            """\
+CREATE TABLE IF NOT EXISTS lot_participants (
+    auction_id INTEGER REFERENCES lots(auction_id) ON DELETE CASCADE,
+    user_id BIGINT,
+    PRIMARY KEY (auction_id, user_id)
 )\
             """,
             """\
@@ -93,9 +344,14 @@ CREATE TABLE IF NOT EXISTS payments (
     payment_status TEXT DEFAULT 'pending',
     payment_id TEXT,
     paid_at TIMESTAMP,
+    deadline TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 )\
             """,
+            # Для баз, созданных до появления срока оплаты
+            "ALTER TABLE payments ADD COLUMN IF NOT EXISTS deadline TIMESTAMP",
+            # Текущий лидер лота — обновляется вместе с current_price
+            "ALTER TABLE lots ADD COLUMN IF NOT EXISTS leader_user_id BIGINT",
             """\
 CREATE TABLE IF NOT EXISTS notifications (
     id SERIAL PRIMARY KEY,
@@ -112,34 +368,90 @@ CREATE TABLE IF NOT EXISTS notifications (
             "CREATE INDEX IF NOT EXISTS idx_lots_auction_id ON lots(auction_id);",
             "CREATE INDEX IF NOT EXISTS idx_lots_status ON lots(status);",
             "CREATE INDEX IF NOT EXISTS idx_lots_end_time ON lots(end_time);",
+            f"""\
+CREATE INDEX IF NOT EXISTS idx_lots_browse ON lots (({LOT_BROWSE_KEY}), auction_id)
+WHERE status IN ('pending','active');\
+            """,
             "CREATE INDEX IF NOT EXISTS idx_bids_auction_id ON bids(auction_id);",
             "CREATE INDEX IF NOT EXISTS idx_bids_user_id ON bids(user_id);",
             "CREATE INDEX IF NOT EXISTS idx_payments_payment_id ON payments(payment_id);",
+            "CREATE INDEX IF NOT EXISTS idx_payments_status ON payments(payment_status);",
+            "CREATE INDEX IF NOT EXISTS idx_payments_auction_user ON payments(auction_id, user_id);",
             "CREATE INDEX IF NOT EXISTS idx_notifications_user_auction ON notifications(user_id, auction_id);"
         ]
 
+        # Уведомление об изменении лота для кэшей всех экземпляров бота
+        triggers = [
+            f"""\
+CREATE OR REPLACE FUNCTION notify_lot_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{LOT_CHANGED_CHANNEL}', COALESCE(NEW.auction_id, OLD.auction_id)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql\
+            """,
+            "DROP TRIGGER IF EXISTS lots_notify_changed ON lots",
+            """\
+CREATE TRIGGER lots_notify_changed
+AFTER INSERT OR UPDATE OR DELETE ON lots
+FOR EACH ROW EXECUTE PROCEDURE notify_lot_changed()\
+            """,
+        ]
+
         async with self.pool.acquire() as connection:
             async with connection.transaction():
+                backfill = await connection.fetchval("SELECT to_regclass('lot_participants') IS NULL")
+                backfill_leaders = not await connection.fetchval("""\
+SELECT EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name = 'lots' AND column_name = 'leader_user_id'
+)\
+                """)
                 for table_sql in tables:
                     await connection.execute(table_sql)
+                if backfill:
+                    # Таблица только что создана — переносим участников из истории ставок
+                    await connection.execute(BACKFILL_PARTICIPANTS)
+                if backfill_leaders:
+                    await connection.execute(BACKFILL_LEADERS)
                 for index_sql in indexes:
                     await connection.execute(index_sql)
+                for trigger_sql in triggers:
+                    await connection.execute(trigger_sql)
 
     # --- Users ---
     async def upsert_user(self, user_id: int, user_name: str):
+        async with self.pool.acquire() as connection:
+            await self.statements.fetch(connection, "upsert_user", user_id, user_name)
+
+    def register_user(self, user_id: int, user_name: str):
+        """Отложенный upsert_user: без запроса к БД, если имя не изменилось"""
+        self.user_buffer.register(user_id, user_name)
+
+    async def upsert_users(self, users: List[Tuple[int, str]]):
+        """Многострочный upsert; строки с тем же именем не перезаписываются"""
         query = """\
 INSERT INTO users (user_id, user_name)
-VALUES ($1, $2)
-ON CONFLICT (user_id) DO UPDATE SET user_name = EXCLUDED.user_name\
+SELECT * FROM unnest($1::bigint[], $2::text[])
+ON CONFLICT (user_id) DO UPDATE SET user_name = EXCLUDED.user_name
+WHERE users.user_name IS DISTINCT FROM EXCLUDED.user_name\
         """
-        await self.execute(query, user_id, user_name)
+        await self.execute(query, [u[0] for u in users], [u[1] for u in users])
 
     async def get_user(self, user_id: int) -> Optional[Dict]:
-        query = "SELECT * FROM users WHERE user_id = $1"
-        return await self.fetchone(query, user_id)
+        async with self.pool.acquire() as connection:
+            return await self.statements.fetchrow(connection, "get_user", user_id)
+
+    async def load_bans(self):
+        """Сверка индекса банов с БД (при старте и периодически — баны других экземпляров)"""
+        rows = await self.fetchall(
+            "SELECT user_id, banned_until FROM users WHERE banned_until > NOW()"
+        )
+        self.bans.load((r['user_id'], r['banned_until']) for r in rows)
 
     async def add_warning_auto_ban(self, user_id: int, ban_days: int):
         """Атомарная операция: предупреждение + бан при необходимости"""
+        await self.user_buffer.flush_user(user_id)
         async with self.pool.acquire() as connection:
             async with connection.transaction():
                 user = await connection.fetchrow(
@@ -159,10 +471,14 @@ ON CONFLICT (user_id) DO UPDATE SET user_name = EXCLUDED.user_name\
                     "UPDATE users SET warnings = $1, banned_until = $2 WHERE user_id = $3",
                     warnings, banned_until, user_id
                 )
+        if banned_until is not None:
+            self.bans.set(user_id, banned_until)
 
     async def set_ban(self, user_id: int, until: Optional[datetime.datetime]):
+        await self.user_buffer.flush_user(user_id)
         query = "UPDATE users SET banned_until = $1 WHERE user_id = $2"
         await self.execute(query, until, user_id)
+        self.bans.set(user_id, until)
 
     async def increment_warning(self, user_id: int):
         query = "UPDATE users SET warnings = warnings + 1 WHERE user_id = $1"
@@ -191,26 +507,249 @@ VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, 'pending')\
     async def set_lot_status(self, auction_id: int, status: str):
         query = "UPDATE lots SET status = $1 WHERE auction_id = $2"
         await self.execute(query, status, auction_id)
+        self.lot_cache.update(auction_id, status=status)
 
     async def set_lot_end_time(self, auction_id: int, end_time: datetime.datetime):
         query = "UPDATE lots SET end_time = $1 WHERE auction_id = $2"
         await self.execute(query, end_time, auction_id)
-
-    async def get_lot(self, auction_id: int) -> Optional[Dict]:
-        query = "SELECT * FROM lots WHERE auction_id = $1"
-        return await self.fetchone(query, auction_id)
+        # Время в БД хранится без пояса — перечитаем при следующем обращении
+        self.lot_cache.invalidate(auction_id)
+
+    async def get_lot(self, auction_id: int, use_cache: bool = True) -> Optional[Dict]:
+        """Лот из кэша или из БД (возвращаемый словарь не изменяйте)"""
+        if use_cache and self._listener is not None:
+            lot = self.lot_cache.get(auction_id)
+            if lot is not None:
+                return lot
+
+        # Токен берём до чтения: сброс, пришедший во время запроса, не даст закэшировать старую строку
+        token = self.lot_cache.token(auction_id)
+        async with self.pool.acquire() as connection:
+            row = await self.statements.fetchrow(connection, "get_lot", auction_id)
+        if row is None:
+            return None
+        lot = dict(row)
+        if self._listener is not None:
+            self.lot_cache.put(auction_id, lot, token)
+        return lot
 
     async def update_current_price(self, auction_id: int, amount: float):
-        query = "UPDATE lots SET current_price = $1 WHERE auction_id = $2"
-        await self.execute(query, amount, auction_id)
+        async with self.pool.acquire() as connection:
+            await self.statements.fetch(connection, "update_current_price", amount, auction_id)
+        self.lot_cache.update(auction_id, current_price=Decimal(str(amount)))
 
     async def set_channel_message_id(self, auction_id: int, message_id: int):
         """Сохраняем ID сообщения в канале для последующего обновления"""
         query = "UPDATE lots SET channel_message_id = $1 WHERE auction_id = $2"
         await self.execute(query, message_id, auction_id)
+        self.lot_cache.update(auction_id, channel_message_id=message_id)
+
     async def set_winner(self, auction_id: int, user_id: Optional[int]):
         query = "UPDATE lots SET winner_user_id = $1 WHERE auction_id = $2"
         await self.execute(query, user_id, auction_id)
+        self.lot_cache.update(auction_id, winner_user_id=user_id)
+
+    async def activate_lots(self, auction_ids: List[int], end_time: datetime.datetime,
+                            started_before: Optional[datetime.datetime] = None,
+                            statuses: Tuple[str, ...] = ('pending',)) -> List[Dict]:
+        """Запуск лотов одним запросом (статус + время окончания), возвращает запущенные.
+
+        Лоты не в statuses и лоты, чей start_time позже started_before (старт
+        перенесли), не трогаются.
+        """
+        query = """\
+UPDATE lots
+SET status = 'active', end_time = $2, last_updated = NOW()
+WHERE auction_id = ANY($1::int[])
+AND status = ANY($3::text[])
+AND ($4::timestamp IS NULL OR start_time IS NULL OR start_time <= $4)
+RETURNING *\
+        """
+        tokens = {auction_id: self.lot_cache.token(auction_id) for auction_id in auction_ids}
+        lots = [dict(row) for row in
+                await self.fetchall(query, auction_ids, end_time, list(statuses), started_before)]
+        for lot in lots:
+            auction_id = lot['auction_id']
+            if self._listener is not None and tokens[auction_id] == self.lot_cache.token(auction_id):
+                self.lot_cache.put(auction_id, lot)
+            else:
+                # Лот меняли параллельно — не знаем, чья запись новее
+                self.lot_cache.invalidate(auction_id)
+        return lots
+
+    async def set_channel_message_ids(self, auction_ids: List[int], message_ids: List[int]):
+        """ID сообщений в канале для нескольких лотов одним запросом"""
+        query = """\
+UPDATE lots l
+SET channel_message_id = t.message_id
+FROM unnest($1::int[], $2::bigint[]) AS t(auction_id, message_id)
+WHERE l.auction_id = t.auction_id\
+        """
+        await self.execute(query, auction_ids, message_ids)
+        for auction_id, message_id in zip(auction_ids, message_ids):
+            self.lot_cache.update(auction_id, channel_message_id=message_id)
+
+    async def finish_lot(self, auction_id: int) -> Optional[Dict]:
+        """Завершение лота вместе с его лидирующей ставкой одним запросом.
+
+        None — лот не найден или уже завершён; user_id/amount пусты, если ставок не было.
+        """
+        query = """\
+WITH finished AS (
+    UPDATE lots
+    SET status = 'finished', last_updated = NOW()
+    WHERE auction_id = $1 AND status <> 'finished'
+    RETURNING auction_id
+)
+SELECT f.auction_id, b.user_id, b.amount
+FROM finished f
+LEFT JOIN LATERAL (
+    SELECT user_id, amount FROM bids
+    WHERE auction_id = f.auction_id
+    ORDER BY amount DESC, created_at DESC
+    LIMIT 1
+) b ON TRUE\
+        """
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                row = await connection.fetchrow(query, auction_id)
+        self.lot_cache.update(auction_id, status='finished')
+        return row
+
+    # --- Bids ---
+    async def add_bid_transaction(self, auction_id: int, user_id: int, amount: float,
+                                  extend_threshold: datetime.timedelta,
+                                  extend_to: datetime.timedelta) -> BidResult:
+        """Атомарная ставка за один запрос: бан, статус лота, шаг, вставка, цена и антиснайп"""
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                row = await self.statements.fetchrow(
+                    connection, "place_bid",
+                    auction_id, user_id, amount, MIN_STEP, extend_threshold, extend_to
+                )
+
+        if not row:
+            return BidResult(BidStatus.NOT_FOUND)
+
+        status = BidStatus(row['outcome'])
+        if status is BidStatus.ACCEPTED and not row['inserted']:
+            # Дубликат (auction_id, user_id, amount) — цену не двигаем
+            status = BidStatus.TOO_LOW
+        if status is BidStatus.ACCEPTED:
+            self.lot_cache.update(auction_id, current_price=row['current_price'], end_time=row['end_time'],
+                                  leader_user_id=user_id)
+
+        return BidResult(
+            status=status,
+            current_price=float(row['current_price']) if row['current_price'] is not None else None,
+            end_time=row['end_time'],
+            extended=bool(row['extended']),
+            lot_name=row['name'],
+            banned_until=row['banned_until'],
+            previous_leader_id=row['previous_leader_id'],
+        )
+
+    async def get_last_bid(self, auction_id: int) -> Optional[Dict]:
+        """Лидирующая (максимальная) ставка по лоту"""
+        async with self.pool.acquire() as connection:
+            return await self.statements.fetchrow(connection, "get_last_bid", auction_id)
+
+    async def get_participants(self, auction_id: int) -> List[Dict]:
+        """Все пользователи, делавшие ставки по лоту (без просмотра bids)"""
+        async with self.pool.acquire() as connection:
+            return await self.statements.fetch(connection, "get_participants", auction_id)
+
+    async def rebuild_participants(self):
+        """Досоздать lot_participants по bids (после загрузки ставок в обход add_bid_transaction)"""
+        await self.execute(BACKFILL_PARTICIPANTS)
+
+    async def get_user_auctions(self, user_id: int, limit: int = 20) -> List[Dict]:
+        """Лоты, где пользователь делал ставки, с его максимальной ставкой (раздел «Мои аукционы»)"""
+        query = """\
+SELECT l.auction_id, l.name, l.current_price, l.status,
+       l.winner_user_id, MAX(b.amount) as my_bid
+FROM bids b
+JOIN lots l ON b.auction_id = l.auction_id
+WHERE b.user_id = $1
+GROUP BY l.auction_id
+ORDER BY l.end_time DESC
+LIMIT $2\
+        """
+        return await self.fetchall(query, user_id, limit)
+
+    # --- Payments ---
+    async def get_next_payment_candidate(self, auction_id: int) -> Optional[Dict]:
+        """Следующий претендент на оплату: максимальная ставка среди тех, кому ещё не выставляли счёт"""
+        query = """\
+SELECT b.user_id, MAX(b.amount) AS amount
+FROM bids b
+WHERE b.auction_id = $1
+AND NOT EXISTS (
+    SELECT 1 FROM payments p WHERE p.auction_id = b.auction_id AND p.user_id = b.user_id
+)
+AND NOT EXISTS (
+    SELECT 1 FROM users u WHERE u.user_id = b.user_id AND u.banned_until > NOW()
+)
+GROUP BY b.user_id
+ORDER BY amount DESC
+LIMIT 1\
+        """
+        return await self.fetchone(query, auction_id)
+
+    async def create_payment(self, auction_id: int, user_id: int, amount: float,
+                             payment_id: str, deadline: datetime.datetime):
+        """Счёт победителю + фиксация победителя лота одной транзакцией"""
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute(
+                    """\
+INSERT INTO payments (auction_id, user_id, amount, payment_status, payment_id, deadline)
+VALUES ($1, $2, $3, 'pending', $4, $5)\
+                    """,
+                    auction_id, user_id, amount, payment_id, deadline
+                )
+                await connection.execute(
+                    "UPDATE lots SET winner_user_id = $1 WHERE auction_id = $2",
+                    user_id, auction_id
+                )
+        self.lot_cache.update(auction_id, winner_user_id=user_id)
+
+    async def transition_payment(self, payment_id: str, from_status: str,
+                                 to_status: str) -> Optional[Dict]:
+        """Смена статуса платежа, только если он всё ещё from_status (идемпотентно)"""
+        query = """\
+UPDATE payments
+SET payment_status = $3,
+    paid_at = CASE WHEN $3 = 'completed' THEN NOW() ELSE paid_at END
+WHERE payment_id = $1 AND payment_status = $2
+RETURNING *\
+        """
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                return await connection.fetchrow(query, payment_id, from_status, to_status)
+
+    async def apply_payment_transitions(self, payment_ids: List[str],
+                                        statuses: List[str]) -> List[Dict]:
+        """Пакетная смена статусов ожидающих платежей одним запросом; возвращает изменённые"""
+        query = """\
+UPDATE payments p
+SET payment_status = t.status,
+    paid_at = CASE WHEN t.status = 'completed' THEN NOW() ELSE p.paid_at END
+FROM unnest($1::text[], $2::text[]) AS t(payment_id, status)
+WHERE p.payment_id = t.payment_id AND p.payment_status = 'pending'
+RETURNING p.*\
+        """
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                return await connection.fetch(query, payment_ids, statuses)
+
+    async def get_pending_payments(self) -> List[Dict]:
+        query = """\
+SELECT auction_id, user_id, amount, payment_id, deadline
+FROM payments
+WHERE payment_status = 'pending'\
+        """
+        return await self.fetchall(query)
 
     async def get_active_or_pending_lots(self) -> List[Dict]:
         query = """\
@@ -221,6 +760,57 @@ ORDER BY start_time ASC\
         """
         return await self.fetchall(query)
 
+    async def get_lots_page(self, statuses: Sequence[str], limit: int,
+                            cursor: Optional[int] = None, backward: bool = False) -> LotPage:
+        """Страница лотов по (start_time, auction_id) после/до лота cursor (keyset-пагинация)"""
+        # Статусы подставляются литералами: иначе в общем плане частичный индекс не подходит
+        unknown = set(statuses) - set(BROWSE_STATUSES)
+        if unknown:
+            raise ValueError(f"Статусы {unknown} не поддерживаются в списке лотов")
+        status_list = ", ".join(f"'{status}'" for status in statuses)
+        columns = "auction_id, name, current_price, status, start_time"
+        if cursor is None:
+            query = f"""\
+SELECT {columns}
+FROM lots
+WHERE status IN ({status_list})
+ORDER BY {LOT_BROWSE_KEY}, auction_id
+LIMIT $1\
+            """
+            rows = await self.fetchall(query, limit + 1)
+            return LotPage(rows[:limit], has_next=len(rows) > limit)
+
+        op, order = ("<", "DESC") if backward else (">", "ASC")
+        query = f"""\
+SELECT {columns}
+FROM lots
+WHERE status IN ({status_list})
+  AND ({LOT_BROWSE_KEY}, auction_id) {op}
+      ((SELECT {LOT_BROWSE_KEY} FROM lots WHERE auction_id = $2), $2)
+ORDER BY {LOT_BROWSE_KEY} {order}, auction_id {order}
+LIMIT $1\
+        """
+        rows = await self.fetchall(query, limit + 1, cursor)
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if backward:
+            rows.reverse()
+            return LotPage(rows, has_prev=more, has_next=True)
+        return LotPage(rows, has_prev=True, has_next=more)
+
+    async def count_lots(self, statuses: Sequence[str]) -> int:
+        """Число лотов в статусах; пересчитывается не чаще раза в LOT_COUNT_TTL секунд"""
+        key = tuple(sorted(statuses))
+        cached = self._lot_counts.get(key)
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < LOT_COUNT_TTL:
+            return cached[1]
+        row = await self.fetchone(
+            "SELECT COUNT(*) AS n FROM lots WHERE status = ANY($1::text[])", list(key)
+        )
+        self._lot_counts[key] = (now, row['n'])
+        return row['n']
+
     async def get_finished_lots_to_close(self) -> List[Dict]:
         query = """\
 SELECT auction_id FROM lots
@@ -228,6 +818,15 @@ WHERE status = 'active' AND end_time IS NOT NULL AND end_time <= NOW()\
         """
         return await self.fetchall(query)
 
+    async def get_lot_schedule(self) -> List[Dict]:
+        """Время старта/окончания всех незавершённых лотов для таймеров"""
+        query = """\
+SELECT auction_id, status, start_time, end_time
+FROM lots
+WHERE status IN ('pending','active')\
+        """
+        return await self.fetchall(query)
+
     async def get_upcoming_lots(self, hours: int = 24) -> List[Dict]:
         """Получение лотов, которые начнутся в ближайшие часы ИЛИ уже должны были начаться"""
         query = """\
@@ -243,16 +842,19 @@ ORDER BY start_time ASC
         """Установка ID сообщения в канале"""
         query = "UPDATE lots SET channel_message_id = $1 WHERE auction_id = $2"
         await self.execute(query, message_id, auction_id)
+        self.lot_cache.update(auction_id, channel_message_id=message_id)
 
     async def set_lot_end_time(self, auction_id: int, end_time):
         """Установка времени окончания аукциона"""
         query = "UPDATE lots SET end_time = $1 WHERE auction_id = $2"
         await self.execute(query, end_time, auction_id)
+        self.lot_cache.invalidate(auction_id)
 
     async def set_lot_status(self, auction_id: int, status: str):
         """Установка статуса лота"""
         query = "UPDATE lots SET status = $1 WHERE auction_id = $2"
         await self.execute(query, status, auction_id)
+        self.lot_cache.update(auction_id, status=status)
 
     async def fetchrow(self, query: str, *args):
         """Выполнить запрос и вернуть одну строку"""
@@ -0,0 +1,82 @@
+import datetime
+import hashlib
+import math
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class BloomFilter:
+    """Фильтр Блума по целым id: «точно нет» или «возможно есть»"""
+
+    def __init__(self, capacity: int = 10000, error_rate: float = 0.01):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: int):
+        digest = hashlib.blake2b(key.to_bytes(8, "little", signed=True), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: int):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: int) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class BanIndex:
+    """Заблокированные пользователи в памяти: user_id -> окончание бана.
+
+    Почти все проверяемые пользователи не забанены, и для них ответ даёт
+    фильтр Блума без обращения к словарю. Истёкшие баны удаляются при
+    обращении. Удалить id из фильтра нельзя, поэтому он пересобирается при
+    каждой сверке с БД (load) и когда добавленных id больше его ёмкости.
+    """
+
+    def __init__(self, capacity: int = 10000, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bans: Dict[int, datetime.datetime] = {}
+        self.bloom = BloomFilter(capacity, error_rate)
+        self._added = 0
+
+    def _rebuild(self):
+        self.bloom = BloomFilter(max(self.capacity, len(self.bans) * 2), self.error_rate)
+        for user_id in self.bans:
+            self.bloom.add(user_id)
+        self._added = len(self.bans)
+
+    def load(self, bans: Iterable[Tuple[int, datetime.datetime]]):
+        """Полная замена содержимого (при старте и периодической сверке с БД)"""
+        self.bans = {user_id: until for user_id, until in bans}
+        self._rebuild()
+
+    def set(self, user_id: int, until: Optional[datetime.datetime]):
+        if until is None or until <= datetime.datetime.now():
+            self.bans.pop(user_id, None)
+            return
+        self.bans[user_id] = until
+        if user_id not in self.bloom:
+            self.bloom.add(user_id)
+            self._added += 1
+            if self._added > self.bloom.capacity:
+                self._rebuild()
+
+    def banned_until(self, user_id: int) -> Optional[datetime.datetime]:
+        """Окончание действующего бана или None"""
+        if user_id not in self.bloom:
+            return None
+        until = self.bans.get(user_id)
+        if until is None:
+            return None
+        if until <= datetime.datetime.now():
+            del self.bans[user_id]
+            return None
+        return until
+
+    def __len__(self) -> int:
+        return len(self.bans)
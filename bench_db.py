@@ -0,0 +1,206 @@
+"""Замеры запросов AsyncDatabase на локальной Postgres с тестовыми данными.
+
+Каждый метод вызывается --iterations раз (после --warmup прогревочных),
+результат — p50/p95/p99, среднее, операций/с и запросов к БД на вызов в
+JSON. Подготовка вызова (например, чтение текущей цены для ставки) в замер
+не входит; get_lot замеряется в обход кэша лотов, кэш — отдельно
+(get_lot_cached). С --baseline результаты сравниваются с прошлым прогоном:
+рост p50 или p95 больше чем на --threshold считается регрессией (код
+выхода 1).
+
+Ставки (add_bid_transaction) меняют данные — запускайте на отдельной базе.
+
+Пример:
+  python bench_db.py --db-uri postgresql://localhost/auction_bench --output bench_100k.json
+  python bench_db.py --db-uri postgresql://localhost/auction_bench --baseline bench_100k.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from async_db import AsyncDatabase
+from config import DB_URI, MIN_STEP
+
+EXTEND_THRESHOLD = datetime.timedelta(minutes=5)
+EXTEND_TO = datetime.timedelta(minutes=10)
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def table_sizes(db: AsyncDatabase) -> Dict[str, int]:
+    sizes = {}
+    for table in ("users", "lots", "bids", "payments"):
+        row = await db.fetchone(f"SELECT COUNT(*) AS n FROM {table}")
+        sizes[table] = row['n']
+    return sizes
+
+
+class Case:
+    """Замеряемый вызов; prepare() выполняется перед каждым вызовом вне замера"""
+
+    def __init__(self, run: Callable[..., Awaitable[Any]],
+                 prepare: Optional[Callable[[], Awaitable[Any]]] = None):
+        self.run = run
+        self.prepare = prepare
+
+
+async def build_cases(db: AsyncDatabase) -> Dict[str, Case]:
+    """Вызовы для замера с реальными id из базы"""
+    lots = [r['auction_id'] for r in await db.fetchall("SELECT auction_id FROM lots")]
+    active = [r['auction_id'] for r in await db.fetchall(
+        "SELECT auction_id FROM lots WHERE status = 'active'")]
+    # Самые активные участники — худший случай для «Моих аукционов»
+    bidders = [r['user_id'] for r in await db.fetchall(
+        "SELECT user_id FROM bids GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 100")]
+    users = [r['user_id'] for r in await db.fetchall(
+        "SELECT user_id FROM users WHERE banned_until IS NULL LIMIT 1000")]
+    if not lots or not users:
+        raise SystemExit("❌ База пуста: сначала заполните её (python seed_data.py)")
+    active = active or lots
+    bidders = bidders or users
+
+    async def next_bid():
+        # Свежая цена из БД (не из кэша), чтобы ставка проходила; в замер не входит
+        auction_id = random.choice(active)
+        row = await db.fetchone("SELECT current_price FROM lots WHERE auction_id = $1", auction_id)
+        amount = float(row['current_price'] or 0) + MIN_STEP + random.randint(0, 4) * 10
+        return auction_id, random.choice(users), amount
+
+    def place_bid(bid):
+        auction_id, user_id, amount = bid
+        return db.add_bid_transaction(auction_id, user_id, amount, EXTEND_THRESHOLD, EXTEND_TO)
+
+    return {
+        "get_lot": Case(lambda: db.get_lot(random.choice(lots), use_cache=False)),
+        "get_lot_cached": Case(lambda: db.get_lot(random.choice(lots))),
+        "get_user": Case(lambda: db.get_user(random.choice(users))),
+        "get_active_or_pending_lots": Case(db.get_active_or_pending_lots),
+        "get_lots_page": Case(lambda: db.get_lots_page(("pending", "active"), 5)),
+        "get_upcoming_lots": Case(db.get_upcoming_lots),
+        "get_finished_lots_to_close": Case(db.get_finished_lots_to_close),
+        "get_lot_schedule": Case(db.get_lot_schedule),
+        "get_last_bid": Case(lambda: db.get_last_bid(random.choice(active))),
+        "get_participants": Case(lambda: db.get_participants(random.choice(active))),
+        "get_user_auctions": Case(lambda: db.get_user_auctions(random.choice(bidders))),
+        "get_next_payment_candidate": Case(lambda: db.get_next_payment_candidate(random.choice(lots))),
+        "get_pending_payments": Case(db.get_pending_payments),
+        "add_bid_transaction": Case(place_bid, prepare=next_bid),
+    }
+
+
+async def run_case(case: Case) -> Any:
+    if case.prepare is None:
+        return await case.run()
+    return await case.run(await case.prepare())
+
+
+async def measure(db: AsyncDatabase, case: Case, iterations: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        await run_case(case)
+
+    latencies = []
+    queries = 0
+    for _ in range(iterations):
+        args = (await case.prepare(),) if case.prepare is not None else ()
+        queries_before = db.queries
+        t = time.perf_counter()
+        await case.run(*args)
+        latencies.append(time.perf_counter() - t)
+        queries += db.queries - queries_before
+    elapsed = sum(latencies)
+
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "ops_per_s": round(iterations / elapsed, 1),
+        "queries_per_op": round(queries / iterations, 2),
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    """Список регрессий относительно baseline"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if base[metric] > 0 and current[metric] > base[metric] * (1 + threshold):
+                regressions.append(
+                    f"{name}.{metric}: {base[metric]} → {current[metric]} мс "
+                    f"(+{(current[metric] / base[metric] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+async def main(args) -> int:
+    db = AsyncDatabase(args.db_uri)
+    await db.initialize()
+    try:
+        random.seed(args.seed)
+        cases = await build_cases(db)
+        selected = args.only or list(cases)
+
+        results = {}
+        for name in selected:
+            results[name] = await measure(db, cases[name], args.iterations, args.warmup)
+            r = results[name]
+            print(f"⏱ {name}: p50 {r['p50_ms']} мс, p95 {r['p95_ms']} мс, p99 {r['p99_ms']} мс, "
+                  f"{r['ops_per_s']} оп/с, запросов на вызов {r['queries_per_op']}", file=sys.stderr)
+
+        report = {
+            "meta": {
+                "label": args.label,
+                "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                "iterations": args.iterations,
+                "rows": await table_sizes(db),
+            },
+            "results": results,
+        }
+    finally:
+        await db.close()
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        for line in regressions:
+            print(f"❌ Регрессия {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"✅ Регрессий относительно {args.baseline} нет", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры запросов AsyncDatabase")
+    parser.add_argument("--db-uri", default=DB_URI)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--only", action="append", help="замерить только этот метод")
+    parser.add_argument("--label", default="", help="метка прогона, например 100k")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="файл для JSON (по умолчанию stdout)")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимый рост p50/p95")
+    sys.exit(asyncio.run(main(parser.parse_args())))
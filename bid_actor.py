@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд простоя актор лота останавливается
+ACTOR_IDLE_TIMEOUT = 60.0
+
+
+class ActorStats:
+    """Метрики очереди ставок одного лота"""
+    __slots__ = ("processed", "total_time", "max_time", "last_time")
+
+    def __init__(self):
+        self.processed = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_time = 0.0
+
+    def record(self, elapsed: float):
+        self.processed += 1
+        self.total_time += elapsed
+        self.last_time = elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.processed if self.processed else 0.0
+
+
+class BidActor:
+    """Почтовый ящик лота: ставки одного аукциона обрабатываются строго по очереди"""
+
+    def __init__(self, auction_id: int, on_idle: Callable[["BidActor"], None]):
+        self.auction_id = auction_id
+        self.mailbox: asyncio.Queue = asyncio.Queue()
+        self.stats = ActorStats()
+        self._on_idle = on_idle
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def queue_depth(self) -> int:
+        return self.mailbox.qsize()
+
+    def submit(self, job: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.mailbox.put_nowait((job, future))
+        return future
+
+    async def _run(self):
+        while True:
+            try:
+                job, future = await asyncio.wait_for(self.mailbox.get(), ACTOR_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                if self.mailbox.empty():
+                    self._on_idle(self)
+                    return
+                continue
+
+            started = time.perf_counter()
+            try:
+                if not future.cancelled():
+                    future.set_result(await job())
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.stats.record(time.perf_counter() - started)
+                self.mailbox.task_done()
+
+    async def stop(self):
+        """Дождаться обработки очереди и остановить актор"""
+        if not self._task.done():
+            await self.mailbox.join()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+class BidActorPool:
+    """Акторы по лотам: ставки одного лота последовательны, разных — параллельны"""
+
+    def __init__(self):
+        self.actors: Dict[int, BidActor] = {}
+
+    async def submit(self, auction_id: int, job: Callable[[], Awaitable[Any]]) -> Any:
+        actor = self.actors.get(auction_id)
+        if actor is None:
+            actor = BidActor(auction_id, self._forget)
+            self.actors[auction_id] = actor
+        return await actor.submit(job)
+
+    def _forget(self, actor: BidActor):
+        if self.actors.get(actor.auction_id) is actor:
+            del self.actors[actor.auction_id]
+
+    def stats(self, auction_id: Optional[int] = None) -> Dict[int, Dict[str, float]]:
+        """Глубина очереди и время обработки ставок по лотам"""
+        actors = self.actors
+        if auction_id is not None:
+            actors = {auction_id: actors[auction_id]} if auction_id in actors else {}
+        return {
+            aid: {
+                "queue_depth": actor.queue_depth,
+                "processed": actor.stats.processed,
+                "avg_ms": actor.stats.avg_time * 1000,
+                "max_ms": actor.stats.max_time * 1000,
+                "last_ms": actor.stats.last_time * 1000,
+            }
+            for aid, actor in actors.items()
+        }
+
+    async def close(self):
+        for actor in list(self.actors.values()):
+            await actor.stop()
+        self.actors.clear()
@@ -2,23 +2,39 @@ import asyncio
 import json
 import logging
 import pytz
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 
 from aiogram import Bot, Dispatcher, types
+from aiogram.bot.api import TelegramAPIServer
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils import executor
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
+from redis import asyncio as aioredis
 
 from config import (
     API_TOKEN, DB_URI, AUCTION_CHANNEL, TIMEZONE, MIN_STEP,
     AUCTION_DURATION_HOURS, EXTEND_THRESHOLD_MIN, EXTEND_TO_MIN,
-    PAYMENT_TIMEOUT_MIN, MAX_UNPAID_WARNINGS, BAN_DAYS, ADMIN_IDS
+    PAYMENT_TIMEOUT_MIN, MAX_UNPAID_WARNINGS, BAN_DAYS, ADMIN_IDS,
+    SEND_WORKERS, SEND_GLOBAL_RATE, SEND_CHAT_RATE, OUTBID_NOTIFY_WINDOW,
+    CHANNEL_UPDATE_INTERVAL, PAYMENT_RECONCILE_INTERVAL, PAYMENT_RECONCILE_BATCH,
+    PAYMENT_RECONCILE_CONCURRENCY, PAYMENT_WEBHOOK_SECRET, PAYMENT_WEBHOOK_HOST,
+    PAYMENT_WEBHOOK_PORT, RATE_LIMIT_REDIS, REDIS_HOST, REDIS_PORT, REDIS_DB,
+    BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+    UPDATE_SHARDS, UPDATE_CONCURRENCY, UPDATE_SHARD_QUEUE_SIZE, TELEGRAM_API_SERVER
 )
-from async_db import AsyncDatabase
+from async_db import AsyncDatabase, BidResult, BidStatus, LotPage
+from live_auction import LiveAuctionRegistry
+from timer_service import TimerService, to_local_naive
 from rate_limit import setup_rate_limit
+from notifier import OutbidNotifier
+from channel_updater import ChannelUpdater
+from payment_flow import PaymentFlow, PaymentReconciler
+from webhook import run_updates_webhook, run_webhook
+from send_queue import Priority, SendQueue
+from sharded_dispatcher import ShardedDispatcher
 from storage_config import get_redis_storage
 
 # Настройка логирования
@@ -32,12 +48,50 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-bot = Bot(token=API_TOKEN)
-dp = Dispatcher(bot, storage=storage)
+if TELEGRAM_API_SERVER:
+    bot = Bot(token=API_TOKEN, server=TelegramAPIServer.from_base(TELEGRAM_API_SERVER))
+else:
+    bot = Bot(token=API_TOKEN)
+storage = get_redis_storage()
+dp = ShardedDispatcher(
+    bot,
+    storage=storage,
+    shards=UPDATE_SHARDS,
+    concurrency=UPDATE_CONCURRENCY,
+    shard_queue_size=UPDATE_SHARD_QUEUE_SIZE
+)
 scheduler = AsyncIOScheduler(timezone=pytz.timezone(TIMEZONE))
 db = AsyncDatabase(DB_URI)
+auctions = LiveAuctionRegistry(
+    db,
+    extend_threshold=timedelta(minutes=EXTEND_THRESHOLD_MIN),
+    extend_to=timedelta(minutes=EXTEND_TO_MIN),
+    ban_checker=db.bans.banned_until
+)
 
-active_timers: Dict[int, asyncio.Task] = {}
+timers = TimerService()
+send_queue = SendQueue(
+    bot,
+    workers=SEND_WORKERS,
+    global_rate=SEND_GLOBAL_RATE,
+    per_chat_rate=SEND_CHAT_RATE
+)
+notifier = OutbidNotifier(send_queue, window=OUTBID_NOTIFY_WINDOW)
+payments = PaymentFlow(
+    db, timers, send_queue,
+    timeout=timedelta(minutes=PAYMENT_TIMEOUT_MIN),
+    ban_days=BAN_DAYS
+)
+payment_reconciler = PaymentReconciler(
+    db, payments,
+    batch_size=PAYMENT_RECONCILE_BATCH,
+    concurrency=PAYMENT_RECONCILE_CONCURRENCY
+)
+channel_updater = ChannelUpdater(
+    send_queue, AUCTION_CHANNEL,
+    render=lambda post: render_tracked_post(post),
+    interval=CHANNEL_UPDATE_INTERVAL
+)
 
 def is_admin(user_id: int) -> bool:
     return user_id in ADMIN_IDS
@@ -76,16 +130,12 @@ async def cmd_start(message: types.Message):
     try:
         user_id = message.from_user.id
         user_name = message.from_user.full_name
-        await db.upsert_user(user_id, user_name)
+        db.register_user(user_id, user_name)
 
-        user = await db.get_user(user_id)
         banned_text = ""
-        if user and user.get('banned_until'):
-            banned_until = user.get('banned_until')
-            if isinstance(banned_until, str):
-                banned_until = datetime.fromisoformat(banned_until)
-            if banned_until > datetime.now():
-                banned_text = f"\n\n⚠️ <b>Вы заблокированы до {format_dt(banned_until)}</b>"
+        banned_until = db.bans.banned_until(user_id)
+        if banned_until:
+            banned_text = f"\n\n⚠️ <b>Вы заблокированы до {format_dt(banned_until)}</b>"
 
         kb = InlineKeyboardMarkup(row_width=2)
         kb.add(
@@ -129,10 +179,41 @@ async def cb_help(callback: types.CallbackQuery):
     await callback.message.edit_text(rules_text, reply_markup=kb, parse_mode="HTML")
     await callback.answer()
 
-@dp.callback_query_handler(lambda c: c.data == "view_auctions")
+# ========== СПИСКИ ЛОТОВ ==========
+
+VIEW_PAGE_SIZE = 5
+MENU_PAGE_SIZE = 10
+
+def page_cursor(data: str) -> Tuple[Optional[int], bool]:
+    """Курсор из callback_data вида '<меню>:n:<id>' (вперёд) или '<меню>:p:<id>' (назад)"""
+    parts = data.split(":")
+    if len(parts) != 3:
+        return None, False
+    return int(parts[2]), parts[1] == "p"
+
+async def lots_page(statuses, limit: int, data: str) -> LotPage:
+    """Страница лотов по курсору из кнопки; если лот-курсор пропал — первая страница"""
+    cursor, backward = page_cursor(data)
+    page = await db.get_lots_page(statuses, limit, cursor, backward)
+    if not page.lots and cursor is not None:
+        page = await db.get_lots_page(statuses, limit)
+    return page
+
+def add_page_buttons(kb: InlineKeyboardMarkup, prefix: str, page: LotPage):
+    """Кнопки «назад/вперёд» с курсором — первым/последним лотом страницы"""
+    row = []
+    if page.has_prev:
+        row.append(InlineKeyboardButton("◀️", callback_data=f"{prefix}:p:{page.lots[0]['auction_id']}"))
+    if page.has_next:
+        row.append(InlineKeyboardButton("▶️", callback_data=f"{prefix}:n:{page.lots[-1]['auction_id']}"))
+    if row:
+        kb.row(*row)
+
+@dp.callback_query_handler(lambda c: c.data.split(":")[0] == "view_auctions")
 async def cb_view_auctions(callback: types.CallbackQuery):
     try:
-        lots = await db.get_active_or_pending_lots()
+        page = await lots_page(("pending", "active"), VIEW_PAGE_SIZE, callback.data)
+        lots = page.lots
         
         if not lots:
             no_lots_text = (
@@ -145,7 +226,7 @@ async def cb_view_auctions(callback: types.CallbackQuery):
             return
         
         text = "🏆 <b>Актуальные аукционы «Ценоловер»:</b>\n\n"
-        for i, lot in enumerate(lots[:5], 1):
+        for i, lot in enumerate(lots, 1):
             status_emoji = "🟢" if lot['status'] == 'active' else "⏳"
             status_text = "Активен" if lot['status'] == 'active' else "Ожидает старта"
             
@@ -162,10 +243,12 @@ async def cb_view_auctions(callback: types.CallbackQuery):
                 text += f"⏰ <b>Старт:</b> <code>Скоро</code>\n"
             text += "─" * 20 + "\n"
         
-        if len(lots) > 5:
-            text += f"\n📊 <i>И еще {len(lots)-5} аукционов...</i>"
+        if page.has_prev or page.has_next:
+            total = await db.count_lots(("pending", "active"))
+            text += f"\n📊 <i>Всего аукционов: {total}</i>"
         
         kb = InlineKeyboardMarkup()
+        add_page_buttons(kb, "view_auctions", page)
         kb.add(InlineKeyboardButton("🎯 Выбрать аукцион", callback_data="join_menu"))
         kb.add(InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main"))
         
@@ -176,22 +259,22 @@ async def cb_view_auctions(callback: types.CallbackQuery):
         await callback.message.answer("❌ Ошибка загрузки аукционов")
     await callback.answer()
 
-@dp.callback_query_handler(lambda c: c.data == "join_menu")
+@dp.callback_query_handler(lambda c: c.data.split(":")[0] == "join_menu")
 async def cb_join_menu(callback: types.CallbackQuery):
     try:
-        lots = await db.get_active_or_pending_lots()
-        active_lots = [lot for lot in lots if lot['status'] == 'active']
+        page = await lots_page(("active",), MENU_PAGE_SIZE, callback.data)
         
-        if not active_lots:
+        if not page.lots:
             await callback.answer("🎯 Сейчас нет активных аукционов", show_alert=True)
             return
         
         kb = InlineKeyboardMarkup(row_width=1)
-        for lot in active_lots[:10]:
+        for lot in page.lots:
             kb.add(InlineKeyboardButton(
                 f"🎯 Аукцион №{lot['auction_id']}: {lot['name'][:30]}...",
                 callback_data=f"join:{lot['auction_id']}"
             ))
+        add_page_buttons(kb, "join_menu", page)
         kb.add(InlineKeyboardButton("⬅️ Назад", callback_data="view_auctions"))
         
         await callback.message.edit_text(
@@ -217,38 +300,40 @@ async def cb_join_auction(callback: types.CallbackQuery):
         auction_id = int(auction_id_str)
         
         # Добавляем пользователя в БД
-        await db.upsert_user(user_id, user_name)
-        
-        # Проверяем бан пользователя
-        user = await db.get_user(user_id)
-        if user and user.get('banned_until'):
-            banned_until = user.get('banned_until')
-            if isinstance(banned_until, str):
-                banned_until = datetime.fromisoformat(banned_until)
-            if banned_until > datetime.now():
-                await callback.answer("🚫 Вы заблокированы для участия", show_alert=True)
-                return
+        db.register_user(user_id, user_name)
         
-        # Проверяем существование лота
-        lot = await db.get_lot(auction_id)
-        if not lot:
-            await callback.answer("❌ Аукцион не найден", show_alert=True)
-            return
-            
-        if lot['status'] != 'active':
-            await callback.answer("⏳ Аукцион еще не начался", show_alert=True)
+        # Проверяем бан пользователя по индексу в памяти
+        if db.bans.banned_until(user_id):
+            await callback.answer("🚫 Вы заблокированы для участия", show_alert=True)
             return
         
+        # Активные лоты берём из памяти, без обращения к БД
+        live = auctions.get(auction_id)
+        if live is None:
+            lot = await db.get_lot(auction_id)
+            if not lot:
+                await callback.answer("❌ Аукцион не найден", show_alert=True)
+                return
+
+            if lot['status'] != 'active':
+                await callback.answer("⏳ Аукцион еще не начался", show_alert=True)
+                return
+
+            live = await auctions.load(auction_id)
+            if live is None:
+                await callback.answer("⏳ Аукцион еще не начался", show_alert=True)
+                return
+        
         # Отправляем сообщение пользователю
         await callback.message.answer(
             f"✅ <b>Вы присоединились к аукциону №{auction_id}!</b>\n\n"
-            f"📦 <b>Товар:</b> {lot['name']}\n"
-            f"💰 <b>Текущая цена:</b> {lot['current_price']}₽\n\n"
+            f"📦 <b>Товар:</b> {live.name}\n"
+            f"💰 <b>Текущая цена:</b> {live.current_price}₽\n\n"
             f"⚡ <b>Сделайте ставку:</b>\n"
             f"Отправьте <code>/bid {auction_id} СУММА</code>\n"
-            f"<i>Минимальная ставка: {float(lot['current_price']) + MIN_STEP}₽</i>\n\n"
+            f"<i>Минимальная ставка: {live.min_bid}₽</i>\n\n"
             f"📊 <b>Следите за аукционом:</b>\n"
-            f"<a href='https://t.me/{AUCTION_CHANNEL[1:]}/{lot.get('channel_message_id', '')}'>Перейти в канал →</a>",
+            f"<a href='https://t.me/{AUCTION_CHANNEL[1:]}/{live.channel_message_id or ''}'>Перейти в канал →</a>",
             parse_mode="HTML",
             disable_web_page_preview=True
         )
@@ -279,51 +364,33 @@ async def cmd_bid(message: types.Message):
         user_id = message.from_user.id
         user_name = message.from_user.full_name
         
-        # Проверяем бан пользователя
-        user = await db.get_user(user_id)
-        if user and user.get('banned_until'):
-            banned_until = user.get('banned_until')
-            if isinstance(banned_until, str):
-                banned_until = datetime.fromisoformat(banned_until)
-            if banned_until > datetime.now():
-                await message.answer(f"🚫 Вы заблокированы для участия до {format_dt(banned_until)}")
-                return
-        
-        # Получаем лот
-        lot = await db.get_lot(auction_id)
-        if not lot:
+        # Горячие лоты проверяются в памяти, остальные — одной транзакцией в БД
+        result = await auctions.place_bid(auction_id, user_id, amount)
+
+        if result.status is BidStatus.NOT_FOUND:
             await message.answer("❌ Аукцион не найден")
             return
-            
-        if lot['status'] != 'active':
+
+        if result.status is BidStatus.BANNED:
+            await message.answer(f"🚫 Вы заблокированы для участия до {format_dt(result.banned_until)}")
+            return
+
+        if result.status is BidStatus.INACTIVE:
             await message.answer("⏳ Этот аукцион не активен")
             return
-        
-        # Добавляем ставку
-        success = await db.add_bid_transaction(auction_id, user_id, amount)
-        
-        if success:
-            # Обновляем время окончания, если нужно
-            end_time = lot.get('end_time')
-            if end_time:
-                if isinstance(end_time, str):
-                    end_time = datetime.fromisoformat(end_time)
-                
-                now = datetime.now(pytz.timezone(TIMEZONE))
-                time_left = (end_time - now).total_seconds() / 60
-                
-                if time_left < EXTEND_THRESHOLD_MIN:
-                    new_end_time = now + timedelta(minutes=EXTEND_TO_MIN)
-                    await db.set_lot_end_time(auction_id, new_end_time)
-                    logger.info(f"⏰ Аукцион {auction_id} продлен до {new_end_time}")
-            
+
+        if result.accepted:
+            if result.extended:
+                schedule_close(auction_id, result.end_time)
+                logger.info(f"⏰ Аукцион {auction_id} продлен до {result.end_time}")
+
             # Уведомляем участников
-            await notify_participants(auction_id, user_id, amount)
-            
+            notify_participants(auction_id, user_id, result)
+
             await message.answer(
                 f"✅ <b>Ваша ставка принята!</b>\n\n"
                 f"🎯 <b>Аукцион №{auction_id}</b>\n"
-                f"📦 <b>Товар:</b> {lot['name']}\n"
+                f"📦 <b>Товар:</b> {result.lot_name}\n"
                 f"💰 <b>Ваша ставка:</b> {amount}₽\n\n"
                 f"<i>Следите за аукционом, вас могут перебить!</i>",
                 parse_mode="HTML"
@@ -331,8 +398,8 @@ async def cmd_bid(message: types.Message):
         else:
             await message.answer(
                 f"❌ <b>Ставка не принята</b>\n\n"
-                f"💰 <b>Текущая цена:</b> {lot['current_price']}₽\n"
-                f"🎯 <b>Минимальная ставка:</b> {float(lot['current_price']) + MIN_STEP}₽\n\n"
+                f"💰 <b>Текущая цена:</b> {result.current_price}₽\n"
+                f"🎯 <b>Минимальная ставка:</b> {result.current_price + MIN_STEP}₽\n\n"
                 f"<i>Сделайте ставку выше текущей цены + минимальный шаг</i>",
                 parse_mode="HTML"
             )
@@ -350,19 +417,7 @@ async def cb_my_auctions(callback: types.CallbackQuery):
         user_id = callback.from_user.id
         
         # Получаем все ставки пользователя
-        query = """\
-SELECT DISTINCT b.auction_id, l.name, l.current_price, l.status, 
-       l.winner_user_id, MAX(b.amount) as my_bid
-FROM bids b
-JOIN lots l ON b.auction_id = l.auction_id
-WHERE b.user_id = $1
-GROUP BY b.auction_id, l.name, l.current_price, l.status, l.winner_user_id
-ORDER BY l.end_time DESC
-LIMIT 20
-        """
-        
-        async with db.pool.acquire() as conn:
-            my_lots = await conn.fetch(query, user_id)
+        my_lots = await db.get_user_auctions(user_id)
         
         if not my_lots:
             text = (
@@ -446,156 +501,365 @@ async def cb_admin_menu(callback: types.CallbackQuery):
     await callback.message.edit_text(admin_text, reply_markup=kb, parse_mode="HTML")
     await callback.answer()
 
-# ========== УВЕДОМЛЕНИЯ ==========
+@dp.message_handler(commands=["bidqueues"])
+async def cmd_bid_queues(message: types.Message):
+    """Очереди ставок по лотам: глубина и время обработки (для админов)"""
+    if not is_admin(message.from_user.id):
+        return
 
-async def notify_participants(auction_id: int, new_bidder_id: int, amount: float):
-    """Уведомление всех участников аукциона о новой ставке"""
-    try:
-        participants = await db.get_participants(auction_id)
-        lot = await db.get_lot(auction_id)
-        
-        if not lot or not participants:
-            return
-        
-        notification_text = (
-            f"🔔 <b>Новая ставка на аукционе №{auction_id}</b>\n\n"
-            f"📦 <b>Товар:</b> {lot['name']}\n"
-            f"💰 <b>Новая цена:</b> {amount}₽\n\n"
-            f"<i>Вашу ставку перебили! Сделайте новую ставку выше текущей.</i>"
+    stats = auctions.actors.stats()
+    if not stats:
+        await message.answer("📭 Очередей ставок сейчас нет")
+        return
+
+    text = "📊 <b>Очереди ставок:</b>\n\n"
+    for auction_id, s in sorted(stats.items()):
+        text += (
+            f"🎯 <b>Аукцион №{auction_id}</b>: в очереди {s['queue_depth']}, "
+            f"обработано {s['processed']}, "
+            f"среднее {s['avg_ms']:.2f} мс, макс {s['max_ms']:.2f} мс\n"
         )
-        
-        for participant in participants:
-            user_id = participant['user_id']
-            if user_id == new_bidder_id:
-                continue
-                
+    await message.answer(text, parse_mode="HTML")
+
+@dp.message_handler(commands=["dbstats"])
+async def cmd_db_stats(message: types.Message):
+    """Подготовленные запросы к БД: число вызовов и время (для админов)"""
+    if not is_admin(message.from_user.id):
+        return
+
+    cache = db.lot_cache.stats()
+    users = db.user_buffer.stats()
+    text = (
+        f"🗄 <b>Запросы к БД</b> (всего {db.queries})\n"
+        f"📦 Кэш лотов: {cache['size']} записей, попаданий {cache['hits']}, промахов {cache['misses']}\n"
+        f"👥 Регистрации: записано {users['written']} за {users['batches']} пакетов, "
+        f"без изменений {users['skipped']}, в буфере {users['pending']}\n\n"
+    )
+    for name, s in sorted(db.statements.stats().items(), key=lambda item: -item[1]['calls']):
+        text += (
+            f"<code>{name}</code>: вызовов {s['calls']}, "
+            f"среднее {s['avg_ms']:.2f} мс, макс {s['max_ms']:.2f} мс\n"
+        )
+    await message.answer(text, parse_mode="HTML")
+
+# ========== КАНАЛ ==========
+
+def format_countdown(end_time: datetime | None) -> str:
+    """Остаток времени с точностью до минуты (чтобы карточка не менялась каждую секунду)"""
+    if not end_time:
+        return "---"
+    total_minutes = int((to_local_naive(end_time) - datetime.now()).total_seconds() // 60)
+    if total_minutes < 0:
+        return "🛑 Завершён"
+    if total_minutes == 0:
+        return "меньше минуты"
+    hours, minutes = divmod(total_minutes, 60)
+    if hours > 0:
+        return f"{hours} ч {minutes:02d} мин"
+    return f"{minutes} мин"
+
+def lot_images(lot) -> List[str]:
+    images_raw = lot.get('images')
+    if not images_raw:
+        return []
+    try:
+        images = json.loads(images_raw) if isinstance(images_raw, str) else images_raw
+    except ValueError:
+        images = [images_raw] if isinstance(images_raw, str) else []
+    return images or []
+
+def join_keyboard(auction_id: int) -> InlineKeyboardMarkup:
+    kb = InlineKeyboardMarkup()
+    kb.add(InlineKeyboardButton("🎯 Участвовать в аукционе", callback_data=f"join:{auction_id}"))
+    return kb
+
+def render_channel_post(auction_id: int, lot, live=None) -> str:
+    """Текст карточки лота в канале; текущие цена и время берутся из памяти"""
+    current_price = live.current_price if live else float(lot.get('current_price') or 0)
+    end_time = live.end_time if live else lot.get('end_time')
+    participants = len(live.participants) if live else 0
+
+    return (
+        f"🎯 <b>Аукцион №{auction_id}</b>\n\n"
+        f"📦 <b>Товар:</b> {lot.get('name', 'Неизвестно')}\n"
+        f"📋 <b>Артикул:</b> {lot.get('article', 'Не указан')}\n"
+        f"💰 <b>Стартовая цена:</b> {float(lot.get('start_price') or 0)}₽\n"
+        f"💎 <b>Текущая цена:</b> {current_price}₽\n"
+        f"👥 <b>Участников:</b> {participants}\n"
+        f"⏳ <b>До окончания:</b> {format_countdown(end_time)}\n\n"
+        f"📝 <b>Описание:</b>\n{lot.get('description', '')}\n\n"
+        f"👇 <i>Нажмите кнопку ниже для участия</i>"
+    )
+
+def render_tracked_post(post) -> Optional[str]:
+    live = auctions.get(post.auction_id)
+    if live is None:
+        return None
+    return render_channel_post(post.auction_id, post.lot, live)
+
+def track_channel_post(auction_id: int, message_id: int, lot, text: Optional[str] = None):
+    """Подключение карточки лота к фоновому обновлению"""
+    channel_updater.track(
+        auction_id, message_id, is_photo=bool(lot_images(lot)), lot=dict(lot),
+        reply_markup=join_keyboard(auction_id), text=text
+    )
+
+async def publish_lot_to_channel(auction_id: int, lot) -> Optional[int]:
+    """Публикация карточки лота в канал, возвращает ID сообщения"""
+    try:
+        caption = render_channel_post(auction_id, lot, auctions.get(auction_id))
+        kb = join_keyboard(auction_id)
+        images = lot_images(lot)
+        message = None
+
+        # Публикация лота идёт в очереди наравне с платёжными сообщениями
+        if images:
             try:
-                await bot.send_message(user_id, notification_text, parse_mode="HTML")
-                logger.info(f"📨 Уведомление отправлено участнику {user_id} по аукциону {auction_id}")
+                message = await send_queue.enqueue(
+                    "send_photo", AUCTION_CHANNEL, Priority.PAYMENT,
+                    photo=images[0], caption=caption, reply_markup=kb, parse_mode="HTML"
+                )
+                logger.info(f"✅ Лот {auction_id} опубликован в канал с фото")
             except Exception as e:
-                logger.warning(f"Не удалось отправить уведомление пользователю {user_id}: {e}")
-                
+                logger.error(f"❌ Ошибка отправки фото в канал: {e}")
+
+        # Если нет фото или ошибка - отправляем текстом
+        if not message:
+            message = await send_queue.send_message(
+                AUCTION_CHANNEL, caption, Priority.PAYMENT,
+                reply_markup=kb, parse_mode="HTML", disable_web_page_preview=True
+            )
+            logger.info(f"✅ Лот {auction_id} опубликован в канал (текст)")
+            lot = {**lot, 'images': None}
+
+        track_channel_post(auction_id, message.message_id, lot, text=caption)
+        return message.message_id
+
+    except Exception as e:
+        logger.error(f"❌ Ошибка публикации лота {auction_id}: {e}")
+        return None
+
+# ========== УВЕДОМЛЕНИЯ ==========
+
+def notify_participants(auction_id: int, new_bidder_id: int, result: BidResult):
+    """Уведомление перебитого участника (объединяется по окну, см. OutbidNotifier)"""
+    try:
+        notifier.on_bid(
+            auction_id, result.lot_name, new_bidder_id, result.current_price, result.previous_leader_id
+        )
     except Exception as e:
         logger.error(f"❌ Ошибка отправки уведомлений: {e}")
 
 # ========== АВТОМАТИЧЕСКИЕ ЗАДАЧИ ==========
 
-async def check_and_start_lots():
-    """Проверяет и запускает лоты, у которых наступило время старта"""
+def schedule_start(auction_id: int, start_time: datetime):
+    """Таймер старта лота"""
+    timers.schedule(("start", auction_id), start_time, lambda: start_lot(auction_id))
+
+def schedule_close(auction_id: int, end_time: datetime):
+    """Таймер закрытия лота (повторный вызов переносит его)"""
+    timers.schedule(("close", auction_id), end_time, lambda: on_close_timer(auction_id))
+
+async def sync_lot_timers():
+    """Восстанавливает таймеры из БД (после перезапуска и для лотов, добавленных извне)"""
     try:
-        upcoming_lots = await db.get_upcoming_lots(hours=1)
-        
-        for lot in upcoming_lots:
+        lots = await db.get_lot_schedule()
+        now = datetime.now()
+        overdue = []
+
+        for lot in lots:
             auction_id = lot['auction_id']
-            start_time = lot['start_time']
-            
-            if isinstance(start_time, str):
-                start_time = datetime.fromisoformat(start_time)
-            
-            now = datetime.now(pytz.timezone(TIMEZONE))
-            if start_time <= now:
-                # Запускаем аукцион
-                end_time = now + timedelta(hours=AUCTION_DURATION_HOURS)
-                await db.set_lot_status(auction_id, 'active')
-                await db.set_lot_end_time(auction_id, end_time)
-                
-                # Публикуем в канал
-                lot_info = await db.get_lot(auction_id)
-                if lot_info:
-                    message_id = await publish_lot_to_channel(auction_id, lot_info)
-                    if message_id:
-                        await db.set_channel_message_id(auction_id, message_id)
-                
-                logger.info(f"🚀 Аукцион {auction_id} запущен, закончится в {end_time}")
-                
+            if lot['status'] == 'pending' and lot['start_time']:
+                start_time = to_local_naive(lot['start_time'])
+                if start_time <= now:
+                    overdue.append(auction_id)
+                elif timers.when(("start", auction_id)) != start_time:
+                    schedule_start(auction_id, start_time)
+            elif lot['status'] == 'active' and lot['end_time']:
+                end_time = to_local_naive(lot['end_time'])
+                scheduled = timers.when(("close", auction_id))
+                if scheduled is None or scheduled < end_time:
+                    schedule_close(auction_id, end_time)
+
+        # Просроченные старты (например, после простоя) запускаем одной пачкой
+        if overdue:
+            for auction_id in overdue:
+                timers.cancel(("start", auction_id))
+            started = await start_lots(overdue)
+            logger.info(f"🚀 Запущено просроченных лотов: {len(started)} из {len(overdue)}")
+
+        logger.info(f"⏱ Таймеры синхронизированы с БД: {len(timers)}")
+
     except Exception as e:
-        logger.error(f"❌ Ошибка при запуске лотов: {e}")
+        logger.error(f"❌ Ошибка синхронизации таймеров: {e}")
 
-async def check_and_close_finished():
-    """Проверяет и закрывает завершенные аукционы"""
+async def start_lots(auction_ids: List[int], force: bool = False) -> List[Dict]:
+    """Запуск лотов: статус и время окончания всех лотов — одним запросом.
+
+    force — запуск админом: без проверки времени старта, активный лот перезапускается.
+    """
+    now = to_local_naive(datetime.now(pytz.timezone(TIMEZONE)))
+    end_time = now + timedelta(hours=AUCTION_DURATION_HOURS)
+    if force:
+        lots = await db.activate_lots(auction_ids, end_time, statuses=('pending', 'active'))
+    else:
+        lots = await db.activate_lots(auction_ids, end_time, started_before=now)
+    if not lots:
+        return []
+
+    # Публикуем в канал
+    message_ids = await asyncio.gather(
+        *(publish_lot_to_channel(lot['auction_id'], lot) for lot in lots)
+    )
+    published = [(lot['auction_id'], mid) for lot, mid in zip(lots, message_ids) if mid]
+    if published:
+        await db.set_channel_message_ids([a for a, _ in published], [m for _, m in published])
+
+    for lot, message_id in zip(lots, message_ids):
+        auction_id = lot['auction_id']
+        live = await auctions.load(auction_id, {**lot, 'channel_message_id': message_id})
+        if live is not None:
+            # Перезапущенный админом лот уже был в памяти — новое время окончания и карточка
+            live.end_time = end_time
+            if message_id:
+                live.channel_message_id = message_id
+        schedule_close(auction_id, end_time)
+        logger.info(f"🚀 Аукцион {auction_id} запущен, закончится в {end_time}")
+    return lots
+
+async def start_lot(auction_id: int):
+    """Запуск лота по таймеру старта"""
     try:
-        finished_lots = await db.get_finished_lots_to_close()
-        
-        for lot in finished_lots:
-            auction_id = lot['auction_id']
-            await close_auction(auction_id)
-            
+        if await start_lots([auction_id]):
+            return
+
+        # Не запустился: лот уже не ожидает старта или время старта перенесли
+        lot = await db.get_lot(auction_id)
+        if lot and lot['status'] == 'pending' and lot['start_time']:
+            schedule_start(auction_id, to_local_naive(lot['start_time']))
+
+    except Exception as e:
+        logger.error(f"❌ Ошибка при запуске лота {auction_id}: {e}")
+
+async def on_close_timer(auction_id: int):
+    """Срабатывание таймера закрытия: закрываем, если лот не продлили"""
+    try:
+        await auctions.flush(auction_id)
+        lot = await db.get_lot(auction_id)
+        if not lot or lot['status'] != 'active':
+            return
+
+        end_time = to_local_naive(lot['end_time']) if lot['end_time'] else None
+        live = auctions.get(auction_id)
+        if live is not None and live.end_time is not None:
+            live_end = to_local_naive(live.end_time)
+            if end_time is None or live_end > end_time:
+                end_time = live_end
+
+        if end_time is not None and end_time > datetime.now():
+            schedule_close(auction_id, end_time)
+            return
+
+        await close_auction(auction_id)
+
     except Exception as e:
-        logger.error(f"❌ Ошибка при закрытии аукционов: {e}")
+        logger.error(f"❌ Ошибка при закрытии аукциона {auction_id}: {e}")
 
 async def close_auction(auction_id: int):
     """Закрытие аукциона и определение победителя"""
     try:
-        # Получаем последнюю ставку
-        last_bid = await db.get_last_bid(auction_id)
-        
-        if last_bid:
-            winner_id = last_bid['user_id']
-            winning_amount = last_bid['amount']
-            
-            await db.set_winner(auction_id, winner_id)
-            await db.set_lot_status(auction_id, 'finished')
-            
-            # Уведомляем победителя
-            try:
-                await bot.send_message(
-                    winner_id,
-                    f"🏆 <b>Поздравляем! Вы выиграли аукцион №{auction_id}</b>\n\n"
-                    f"💰 <b>Сумма к оплате:</b> {winning_amount}₽\n"
-                    f"⏰ <b>Время на оплату:</b> {PAYMENT_TIMEOUT_MIN} минут\n\n"
-                    f"<i>Оплатите через /pay {auction_id}</i>",
-                    parse_mode="HTML"
-                )
-            except Exception as e:
-                logger.warning(f"Не удалось уведомить победителя {winner_id}: {e}")
-            
-            logger.info(f"✅ Аукцион {auction_id} закрыт. Победитель: {winner_id}, сумма: {winning_amount}₽")
+        # Дожидаемся записи всех принятых в памяти ставок
+        await auctions.evict(auction_id)
+        notifier.forget(auction_id)
+        channel_updater.untrack(auction_id)
+
+        # Статус и лидирующая ставка — одним запросом
+        finished = await db.finish_lot(auction_id)
+        if not finished:
+            return
+
+        if finished['user_id'] is not None:
+            # Счёт победителю; при неоплате автомат сам перейдёт к следующему участнику
+            winner_id = await payments.start(auction_id)
+
+            logger.info(f"✅ Аукцион {auction_id} закрыт. Победитель: {winner_id}, сумма: {finished['amount']}₽")
         else:
             # Нет ставок - закрываем без победителя
-            await db.set_lot_status(auction_id, 'finished')
             logger.info(f"📭 Аукцион {auction_id} закрыт без ставок")
             
     except Exception as e:
         logger.error(f"❌ Ошибка закрытия аукциона {auction_id}: {e}")
 async def on_startup(dispatcher: Dispatcher):
     await db.initialize()
+    send_queue.start()
+    await auctions.load_active()
+
+    # Карточки активных лотов в канале снова обновляются после перезапуска
+    for auction_id in list(auctions.auctions):
+        lot = await db.get_lot(auction_id)
+        if lot and lot['channel_message_id']:
+            track_channel_post(auction_id, lot['channel_message_id'], lot)
+    channel_updater.start()
     
-    # Запускаем планировщик задач
+    # Таймеры старта/закрытия срабатывают точно в срок; периодическая
+    # синхронизация только подхватывает лоты, добавленные в БД извне
+    timers.start()
+    await sync_lot_timers()
+    await payments.restore()
+    # Уведомления провайдера подтверждают оплату сразу; сверка остаётся запасным путём
+    dispatcher['payment_webhook'] = await run_webhook(
+        payments, PAYMENT_WEBHOOK_SECRET, PAYMENT_WEBHOOK_HOST, PAYMENT_WEBHOOK_PORT
+    )
     scheduler.start()
-    scheduler.add_job(check_and_start_lots, 'interval', minutes=5)
-    scheduler.add_job(check_and_close_finished, 'interval', minutes=1)
+    scheduler.add_job(sync_lot_timers, 'interval', minutes=5)
+    # Баны, выданные другими экземплярами бота
+    scheduler.add_job(db.load_bans, 'interval', minutes=5)
+    scheduler.add_job(payment_reconciler.run, 'interval', seconds=PAYMENT_RECONCILE_INTERVAL)
     
     logger.info("🚀 Бот «Ценоловер» запущен с Redis storage!")
     
     # Уведомление админам
     for admin_id in ADMIN_IDS:
-        try:
-            await bot.send_message(
-                admin_id,
-                "✅ <b>Бот «Ценоловер» успешно запущен!</b>\n\n"
-                f"⏰ Время: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}\n"
-                f"📢 Канал: {AUCTION_CHANNEL}\n"
-                f"💾 Хранилище: Redis\n\n"
-                "<i>Используйте /start для начала работы</i>",
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            logger.error(f"Не удалось уведомить админа {admin_id}: {e}")
+        send_queue.send_message(
+            admin_id,
+            "✅ <b>Бот «Ценоловер» успешно запущен!</b>\n\n"
+            f"⏰ Время: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}\n"
+            f"📢 Канал: {AUCTION_CHANNEL}\n"
+            f"💾 Хранилище: Redis\n\n"
+            "<i>Используйте /start для начала работы</i>",
+            Priority.BROADCAST,
+            parse_mode="HTML"
+        )
 
 async def on_shutdown(dispatcher: Dispatcher):
-    # Отменяем все таймеры
-    for task in active_timers.values():
-        task.cancel()
-    if active_timers:
-        await asyncio.gather(*active_timers.values(), return_exceptions=True)
+    # Дообрабатываем уже принятые апдейты
+    await dispatcher.close_shards()
+
+    # Останавливаем вебхук платежей и таймеры
+    payment_webhook = dispatcher.get('payment_webhook')
+    if payment_webhook:
+        await payment_webhook.cleanup()
+    await timers.stop()
+    await channel_updater.stop()
     
+    rate_limiter = dispatcher.get('rate_limiter')
+    if rate_limiter:
+        await rate_limiter.close()
+
+    await auctions.close()
+    notifier.close()
+    await send_queue.close()
     await db.close()
     await storage.close()
     logger.info("🛑 Бот «Ценоловер» остановлен")
 
 if __name__ == "__main__":
     # Настройка rate limiting
-    setup_rate_limit(dp)
+    if RATE_LIMIT_REDIS:
+        setup_rate_limit(dp, aioredis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB),
+                         admin_ids=ADMIN_IDS)
+    else:
+        setup_rate_limit(dp, admin_ids=ADMIN_IDS)
     
     logger.info(f"🚀 Запуск бота «Ценоловер»...")
     logger.info(f"📢 Канал: {AUCTION_CHANNEL}")
@@ -603,11 +867,21 @@ if __name__ == "__main__":
     logger.info(f"💾 Хранилище: Redis")
     
     try:
-        executor.start_polling(
-            dp,
-            skip_updates=True,
-            on_startup=on_startup,
-            on_shutdown=on_shutdown
-        )
+        if BOT_MODE == "webhook":
+            logger.info(f"🌐 Режим получения апдейтов: webhook")
+            run_updates_webhook(
+                dp, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+                host=WEBHOOK_HOST,
+                port=WEBHOOK_PORT,
+                on_startup=on_startup,
+                on_shutdown=on_shutdown
+            )
+        else:
+            executor.start_polling(
+                dp,
+                skip_updates=True,
+                on_startup=on_startup,
+                on_shutdown=on_shutdown
+            )
     except Exception as e:
         logger.error(f"❌ Ошибка запуска бота: {e}")
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.exceptions import MessageNotModified
+
+from send_queue import Priority, SendQueue
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelPost:
+    """Опубликованная в канале карточка лота"""
+    __slots__ = ("auction_id", "message_id", "is_photo", "lot", "reply_markup", "last_text", "pending")
+
+    def __init__(self, auction_id: int, message_id: int, is_photo: bool, lot: Dict[str, Any],
+                 reply_markup: Optional[InlineKeyboardMarkup], last_text: Optional[str]):
+        self.auction_id = auction_id
+        self.message_id = message_id
+        self.is_photo = is_photo
+        self.lot = lot
+        self.reply_markup = reply_markup
+        self.last_text = last_text
+        # Правка, поставленная в очередь отправки и ещё не завершённая
+        self.pending: Optional[asyncio.Future] = None
+
+
+class ChannelUpdater:
+    """Фоновое обновление карточек лотов в канале (цена, участники, остаток времени).
+
+    Раз в interval секунд каждая карточка перерисовывается в памяти и
+    редактируется, только если текст изменился. Сколько бы ставок ни пришло
+    за интервал, по лоту будет не больше одного edit_message_*. Пока прошлая
+    правка карточки не отправлена, новая не ставится: все карточки идут в один
+    чат канала с лимитом ~1 сообщение/с, и очередь правок не должна расти.
+    """
+
+    def __init__(self, send_queue: SendQueue, chat_id: Any,
+                 render: Callable[[ChannelPost], Optional[str]], interval: float = 15.0):
+        self.send_queue = send_queue
+        self.chat_id = chat_id
+        self.render = render
+        self.interval = interval
+        self.posts: Dict[int, ChannelPost] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.edits = 0
+
+    def track(self, auction_id: int, message_id: int, is_photo: bool, lot: Dict[str, Any],
+              reply_markup: Optional[InlineKeyboardMarkup] = None, text: Optional[str] = None):
+        """Начать обновлять карточку лота; text — уже опубликованный текст"""
+        self.posts[auction_id] = ChannelPost(auction_id, message_id, is_photo, lot, reply_markup, text)
+
+    def untrack(self, auction_id: int):
+        self.posts.pop(auction_id, None)
+
+    def refresh(self):
+        """Один проход: редактируем только изменившиеся карточки"""
+        for post in list(self.posts.values()):
+            if post.pending is not None and not post.pending.done():
+                # Текст перерисуем, когда уйдёт прошлая правка — он будет свежее
+                continue
+            try:
+                text = self.render(post)
+            except Exception as e:
+                logger.error(f"❌ Ошибка отрисовки карточки лота {post.auction_id}: {e}")
+                continue
+
+            if text is None or text == post.last_text:
+                continue
+
+            post.last_text = text
+            if post.is_photo:
+                future = self.send_queue.enqueue(
+                    "edit_message_caption", self.chat_id, Priority.BROADCAST,
+                    message_id=post.message_id, caption=text,
+                    reply_markup=post.reply_markup, parse_mode="HTML"
+                )
+            else:
+                future = self.send_queue.enqueue(
+                    "edit_message_text", self.chat_id, Priority.BROADCAST,
+                    message_id=post.message_id, text=text,
+                    reply_markup=post.reply_markup, parse_mode="HTML",
+                    disable_web_page_preview=True
+                )
+            post.pending = future
+            future.add_done_callback(lambda f, post=post, text=text: self._on_edited(f, post, text))
+            self.edits += 1
+
+    def _on_edited(self, future: asyncio.Future, post: ChannelPost, text: str):
+        if post.pending is future:
+            post.pending = None
+        # Правка не прошла — перерисуем на следующем проходе
+        if future.cancelled():
+            error = True
+        else:
+            error = future.exception() is not None and not isinstance(future.exception(), MessageNotModified)
+        if error and post.last_text == text:
+            post.last_text = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.refresh()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -5,8 +5,27 @@ load_dotenv()
 
 # Telegram
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+API_TOKEN = BOT_TOKEN
 CHANNEL_ID = os.getenv("CHANNEL_ID")  # @cenolover
+# Канал публикации лотов в виде @username (по нему строятся ссылки на посты)
+AUCTION_CHANNEL = os.getenv("AUCTION_CHANNEL", CHANNEL_ID or "@cenolover")
+TIMEZONE = os.getenv("TIMEZONE", "Europe/Moscow")
 ADMIN_IDS = [int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x]
+# Другой адрес Bot API (локальный сервер, fake_bot_api.py в нагрузочных тестах)
+TELEGRAM_API_SERVER = os.getenv("TELEGRAM_API_SERVER", "")
+
+# Получение апдейтов: polling или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # внешний адрес, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8443))
+# Обработка апдейтов: шарды по пользователю, общий предел параллельности,
+# длина очереди шарда (сверх неё апдейты отбрасываются)
+UPDATE_SHARDS = int(os.getenv("UPDATE_SHARDS", 16))
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", 16))
+UPDATE_SHARD_QUEUE_SIZE = int(os.getenv("UPDATE_SHARD_QUEUE_SIZE", 100))
 
 # Database
 DB_URI = os.getenv("DB_URI")
@@ -15,11 +34,41 @@ DB_URI = os.getenv("DB_URI")
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
+# Общий лимит запросов для всех экземпляров бота через Redis
+RATE_LIMIT_REDIS = os.getenv("RATE_LIMIT_REDIS", "0") == "1"
 
 # Auction settings
 AUCTION_DURATION_HOURS = int(os.getenv("AUCTION_DURATION_HOURS", 12))
 EXTEND_TIME_MINUTES = int(os.getenv("EXTEND_TIME_MINUTES", 10))
 PAYMENT_TIME_MINUTES = int(os.getenv("PAYMENT_TIME_MINUTES", 15))
+# Минимальный шаг ставки, ₽
+MIN_STEP = int(os.getenv("MIN_STEP", 100))
+# Продление: ставка менее чем за EXTEND_THRESHOLD_MIN минут до конца
+# переносит окончание на EXTEND_TO_MIN минут от ставки
+EXTEND_THRESHOLD_MIN = int(os.getenv("EXTEND_THRESHOLD_MIN", 5))
+EXTEND_TO_MIN = int(os.getenv("EXTEND_TO_MIN", EXTEND_TIME_MINUTES))
+PAYMENT_TIMEOUT_MIN = int(os.getenv("PAYMENT_TIMEOUT_MIN", PAYMENT_TIME_MINUTES))
+# Неоплаченных побед до блокировки и её срок
+MAX_UNPAID_WARNINGS = int(os.getenv("MAX_UNPAID_WARNINGS", 3))
+BAN_DAYS = int(os.getenv("BAN_DAYS", 30))
+
+# Outgoing messages (лимиты Telegram Bot API)
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", 8))
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", 30))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", 1))
+# Окно объединения уведомлений о перебитой ставке, секунд
+OUTBID_NOTIFY_WINDOW = float(os.getenv("OUTBID_NOTIFY_WINDOW", 5))
+# Как часто обновлять карточки лотов в канале, секунд
+CHANNEL_UPDATE_INTERVAL = float(os.getenv("CHANNEL_UPDATE_INTERVAL", 15))
+
+# Payments
+PAYMENT_RECONCILE_INTERVAL = int(os.getenv("PAYMENT_RECONCILE_INTERVAL", 30))
+PAYMENT_RECONCILE_BATCH = int(os.getenv("PAYMENT_RECONCILE_BATCH", 100))
+PAYMENT_RECONCILE_CONCURRENCY = int(os.getenv("PAYMENT_RECONCILE_CONCURRENCY", 10))
+# Вебхук провайдера: без секрета не запускается, остаётся только сверка
+PAYMENT_WEBHOOK_SECRET = os.getenv("PAYMENT_WEBHOOK_SECRET", "")
+PAYMENT_WEBHOOK_HOST = os.getenv("PAYMENT_WEBHOOK_HOST", "0.0.0.0")
+PAYMENT_WEBHOOK_PORT = int(os.getenv("PAYMENT_WEBHOOK_PORT", 8080))
 
 # Paths
 QR_CODE_DIR = "qr_codes"
@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Методы, которые считаются исходящими сообщениями бота
+OUTBOUND_METHODS = {
+    "sendMessage", "sendPhoto", "sendMediaGroup", "editMessageText", "editMessageCaption",
+}
+
+
+class FakeBotAPI:
+    """Локальный Bot API для нагрузочных тестов.
+
+    Отдаёт боту апдейты через getUpdates (длинный опрос), принимает
+    sendMessage/sendPhoto/editMessage*/answerCallbackQuery и т.д. с
+    задержкой latency (± jitter) и с вероятностью rate_429 отвечает
+    429 Too Many Requests. Ответы бота можно дожидаться через expect().
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, rate_429: float = 0.0,
+                 retry_after: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.updates: asyncio.Queue = asyncio.Queue()
+        self.waiters: Dict[Any, Tuple[asyncio.Future, Optional[Callable[[Dict[str, Any]], bool]]]] = {}
+        self.calls: Dict[str, int] = {}
+        self.outbound = 0
+        self.throttled = 0
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+
+    # ---------- Апдейты от «пользователей» ----------
+
+    def next_update_id(self) -> int:
+        return next(self._update_ids)
+
+    def push_update(self, update: Dict[str, Any]):
+        self.updates.put_nowait(update)
+
+    def expect(self, key: Any,
+               match: Optional[Callable[[Dict[str, Any]], bool]] = None) -> asyncio.Future:
+        """Будущий ответ бота: ("chat", chat_id) — сообщение в чат,
+        ("callback", callback_query_id) — answerCallbackQuery.
+        match отсеивает посторонние сообщения (например, уведомления)"""
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[key] = (future, match)
+        return future
+
+    def _resolve(self, key: Any, payload: Dict[str, Any]):
+        waiter = self.waiters.get(key)
+        if waiter is None:
+            return
+        future, match = waiter
+        if match is not None and not match(payload):
+            return
+        del self.waiters[key]
+        if not future.done():
+            future.set_result(payload)
+
+    # ---------- HTTP ----------
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        payload = dict(await request.post())
+        if not payload and request.can_read_body:
+            try:
+                payload = await request.json()
+            except ValueError:
+                payload = {}
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+        if method == "getUpdates":
+            return self._ok(await self._get_updates(payload))
+
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        if method != "getMe" and random.random() < self.rate_429:
+            self.throttled += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+
+        if method in OUTBOUND_METHODS:
+            self.outbound += 1
+        return self._ok(self._result(method, payload))
+
+    async def _get_updates(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        timeout = float(payload.get("timeout") or 0)
+        limit = int(payload.get("limit") or 100)
+        try:
+            first = await asyncio.wait_for(self.updates.get(), timeout or 0.01)
+        except asyncio.TimeoutError:
+            return []
+        batch = [first]
+        while len(batch) < limit and not self.updates.empty():
+            batch.append(self.updates.get_nowait())
+        return batch
+
+    def _result(self, method: str, payload: Dict[str, Any]) -> Any:
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+
+        if method == "answerCallbackQuery":
+            self._resolve(("callback", payload.get("callback_query_id")), payload)
+            return True
+
+        chat_id = payload.get("chat_id")
+        if method in OUTBOUND_METHODS and chat_id is not None:
+            try:
+                chat_id = int(chat_id)
+            except ValueError:
+                pass
+            self._resolve(("chat", chat_id), payload)
+            if method.startswith("edit"):
+                return True
+            message = {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+            }
+            if method == "sendPhoto":
+                message["photo"] = [{"file_id": "fake", "file_unique_id": "fake", "width": 1, "height": 1}]
+                message["caption"] = payload.get("caption")
+            else:
+                message["text"] = payload.get("text")
+            return [message] if method == "sendMediaGroup" else message
+
+        return True
+
+    @staticmethod
+    def _ok(result: Any) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081) -> str:
+        """Запуск сервера; возвращает базовый адрес для TelegramAPIServer.from_base"""
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"🧪 Тестовый Bot API: http://{host}:{port}")
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "outbound": self.outbound,
+            "throttled": self.throttled,
+            "calls": dict(self.calls),
+        }
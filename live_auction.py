@@ -0,0 +1,200 @@
+import asyncio
+import datetime
+import logging
+from typing import Callable, Dict, Optional, Set
+
+from async_db import AsyncDatabase, BidResult, BidStatus
+from bid_actor import BidActorPool
+from config import MIN_STEP
+
+logger = logging.getLogger(__name__)
+
+
+class LiveAuction:
+    """Горячее состояние активного лота: цена, лидер, время окончания, участники"""
+    __slots__ = (
+        "auction_id", "name", "current_price", "leader_id", "end_time",
+        "participants", "channel_message_id",
+    )
+
+    def __init__(self, auction_id: int, name: str, current_price: float,
+                 leader_id: Optional[int], end_time: Optional[datetime.datetime],
+                 participants: Set[int], channel_message_id: Optional[int]):
+        self.auction_id = auction_id
+        self.name = name
+        self.current_price = current_price
+        self.leader_id = leader_id
+        self.end_time = end_time
+        self.participants = participants
+        self.channel_message_id = channel_message_id
+
+    @property
+    def min_bid(self) -> float:
+        return self.current_price + MIN_STEP
+
+    def precheck(self, amount: float) -> Optional[BidResult]:
+        """Отказ без обращения к БД, если ставка заведомо мала (иначе None).
+
+        Цена в памяти не выше цены в БД, поэтому отказ по ней всегда верен.
+        Окончание лота здесь не проверяется: его могли продлить ставкой через
+        другой экземпляр, решает БД.
+        """
+        if amount < self.min_bid:
+            return BidResult(BidStatus.TOO_LOW, self.current_price, self.end_time, lot_name=self.name)
+        return None
+
+    def apply(self, user_id: int, result: BidResult):
+        """Состояние по ответу БД на ставку (БД первична)"""
+        if result.current_price is not None:
+            self.current_price = result.current_price
+        if result.end_time is not None:
+            self.end_time = result.end_time
+        if result.accepted:
+            self.leader_id = user_id
+            self.participants.add(user_id)
+
+
+class LiveAuctionRegistry:
+    """Кэш активных лотов в памяти; ставки подтверждаются только после записи в БД.
+
+    Заведомо низкие ставки и ставки забаненных отклоняются по LiveAuction без
+    обращения к БД. Прошедшие проверку пишутся add_bid_transaction до ответа
+    пользователю, так что принятая ставка не теряется при падении процесса,
+    а отказ БД (закрытие админом, ставка через другой экземпляр) доходит до
+    пользователя сразу. Все ставки и загрузки лота проходят через его актор
+    (BidActorPool): запросы одного лота к БД идут по одному и не ждут
+    блокировку строки lots друг за другом. Изменения лота из других
+    экземпляров приходят через LISTEN/NOTIFY и перечитывают его состояние.
+    """
+
+    def __init__(self, db: AsyncDatabase, extend_threshold: datetime.timedelta,
+                 extend_to: datetime.timedelta,
+                 ban_checker: Optional[Callable[[int], Optional[datetime.datetime]]] = None):
+        self.db = db
+        self.extend_threshold = extend_threshold
+        self.extend_to = extend_to
+        self.ban_checker = ban_checker
+        self.auctions: Dict[int, LiveAuction] = {}
+        self.actors = BidActorPool()
+        # Лоты, перечитывание которых уже стоит в очереди актора
+        self._stale: Set[int] = set()
+        db.add_lot_listener(self._on_lot_changed)
+
+    def get(self, auction_id: int) -> Optional[LiveAuction]:
+        return self.auctions.get(auction_id)
+
+    async def load(self, auction_id: int, lot: Optional[Dict] = None) -> Optional[LiveAuction]:
+        """Загрузка активного лота в память через его актор; уже загруженный не перечитывается"""
+        return await self.actors.submit(auction_id, lambda: self._load(auction_id, lot))
+
+    async def _load(self, auction_id: int, lot: Optional[Dict] = None) -> Optional[LiveAuction]:
+        live = self.auctions.get(auction_id)
+        if live is not None:
+            return live
+
+        if lot is None:
+            lot = await self.db.get_lot(auction_id)
+        if not lot or lot['status'] != 'active':
+            return None
+
+        last_bid = await self.db.get_last_bid(auction_id)
+        participants = await self.db.get_participants(auction_id)
+
+        live = LiveAuction(
+            auction_id=auction_id,
+            name=lot['name'],
+            current_price=float(lot['current_price']),
+            leader_id=last_bid['user_id'] if last_bid else None,
+            end_time=lot['end_time'],
+            participants={p['user_id'] for p in participants},
+            channel_message_id=lot['channel_message_id'],
+        )
+        self.auctions[auction_id] = live
+        logger.info(f"🔥 Аукцион {auction_id} загружен в память")
+        return live
+
+    async def load_active(self):
+        """Загрузка всех активных лотов (после перезапуска)"""
+        lots = await self.db.get_active_or_pending_lots()
+        for lot in lots:
+            if lot['status'] == 'active':
+                await self.load(lot['auction_id'])
+
+    async def place_bid(self, auction_id: int, user_id: int, amount: float) -> BidResult:
+        """Ставка через очередь лота: ставки одного аукциона обрабатываются по одной"""
+        return await self.actors.submit(
+            auction_id, lambda: self._place_bid(auction_id, user_id, amount)
+        )
+
+    async def _place_bid(self, auction_id: int, user_id: int, amount: float) -> BidResult:
+        """Ставка: отсев в памяти для горячих лотов, затем транзакция в БД"""
+        live = self.auctions.get(auction_id)
+        if live is not None:
+            if self.ban_checker is not None:
+                banned_until = self.ban_checker(user_id)
+                if banned_until is not None:
+                    return BidResult(BidStatus.BANNED, live.current_price, live.end_time,
+                                     lot_name=live.name, banned_until=banned_until)
+            rejected = live.precheck(amount)
+            if rejected is not None:
+                return rejected
+
+        result = await self.db.add_bid_transaction(
+            auction_id, user_id, amount, self.extend_threshold, self.extend_to
+        )
+
+        live = self.auctions.get(auction_id)
+        if live is not None:
+            if result.status in (BidStatus.INACTIVE, BidStatus.NOT_FOUND):
+                # Лот закрыт в обход этого экземпляра — в памяти ему не место
+                self.auctions.pop(auction_id, None)
+            else:
+                live.apply(user_id, result)
+        return result
+
+    def _on_lot_changed(self, auction_id: Optional[int]):
+        """Лот изменён другим экземпляром (None — могли пропустить любые изменения)"""
+        auction_ids = list(self.auctions) if auction_id is None else [auction_id]
+        for aid in auction_ids:
+            if aid in self.auctions and aid not in self._stale:
+                self._stale.add(aid)
+                asyncio.create_task(self._submit_reload(aid))
+
+    async def _submit_reload(self, auction_id: int):
+        try:
+            await self.actors.submit(auction_id, lambda: self._reload(auction_id))
+        except Exception as e:
+            logger.error(f"❌ Ошибка перезагрузки аукциона {auction_id}: {e}")
+
+    async def _reload(self, auction_id: int):
+        self._stale.discard(auction_id)
+        live = self.auctions.get(auction_id)
+        if live is None:
+            return
+        lot = await self.db.get_lot(auction_id)
+        if not lot or lot['status'] != 'active':
+            self.auctions.pop(auction_id, None)
+            return
+        last_bid = await self.db.get_last_bid(auction_id)
+        participants = await self.db.get_participants(auction_id)
+        live.current_price = float(lot['current_price'])
+        live.end_time = lot['end_time']
+        live.leader_id = last_bid['user_id'] if last_bid else None
+        live.participants = {p['user_id'] for p in participants}
+        if lot['channel_message_id']:
+            live.channel_message_id = lot['channel_message_id']
+
+    async def flush(self, auction_id: int):
+        """Дождаться обработки всех ставок, уже стоящих в очереди лота"""
+        await self.actors.submit(auction_id, lambda: asyncio.sleep(0))
+
+    async def evict(self, auction_id: int):
+        """Выгрузка лота из памяти (при закрытии аукциона) после обработки очереди ставок"""
+        await self.flush(auction_id)
+        if self.auctions.pop(auction_id, None) is not None:
+            logger.info(f"🧊 Аукцион {auction_id} выгружен из памяти")
+
+    async def close(self):
+        """Обработка очередей ставок и остановка акторов"""
+        await self.actors.close()
+        self.auctions.clear()
@@ -0,0 +1,192 @@
+"""Нагрузочный прогон бота против локального Bot API (fake_bot_api.py).
+
+Бот запускается в этом же процессе, апдейты тысяч виртуальных
+пользователей отдаются ему через getUpdates. Сценарии:
+  join  — присоединение к лотам (callback join:<id>);
+  bid   — ставки /bid <id> <сумма> по растущей цене;
+  mixed — присоединение, затем ставки.
+По каждому сценарию: p50/p95/p99 времени ответа, ставки/с, исходящие
+сообщения/с, запросы к БД.
+
+Пример: python load_test.py --users 2000 --requests 5 --scenario mixed --latency 0.05 --rate-429 0.01
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from fake_bot_api import FakeBotAPI
+
+# Виртуальные пользователи не пересекаются с реальными id
+USER_ID_BASE = 9_000_000_000
+RESPONSE_TIMEOUT = 30
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def user_payload(user_id: int) -> Dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": f"Load{user_id - USER_ID_BASE}"}
+
+
+class LoadGenerator:
+    def __init__(self, app, api: FakeBotAPI, auction_ids: List[int], users: int, requests: int):
+        self.app = app
+        self.api = api
+        self.auction_ids = auction_ids
+        self.users = users
+        self.requests = requests
+
+    def _message_update(self, user_id: int, text: str) -> Dict[str, Any]:
+        update_id = self.api.next_update_id()
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": user_payload(user_id),
+                "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+            },
+        }
+
+    def _callback_update(self, user_id: int, data: str) -> Dict[str, Any]:
+        update_id = self.api.next_update_id()
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": user_payload(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": {
+                    "message_id": update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "text": "menu",
+                },
+            },
+        }
+
+    async def join(self, user_id: int) -> Optional[Dict[str, Any]]:
+        update = self._callback_update(user_id, f"join:{random.choice(self.auction_ids)}")
+        waiter = self.api.expect(("callback", update["callback_query"]["id"]))
+        self.api.push_update(update)
+        return await asyncio.wait_for(waiter, RESPONSE_TIMEOUT)
+
+    async def bid(self, user_id: int) -> Optional[Dict[str, Any]]:
+        auction_id = random.choice(self.auction_ids)
+        live = self.app.auctions.get(auction_id)
+        price = live.current_price if live else 0
+        amount = price + self.app.MIN_STEP * random.randint(1, 3)
+        update = self._message_update(user_id, f"/bid {auction_id} {amount:.0f}")
+        # Уведомления о перебитой ставке приходят в тот же чат — ждём именно ответ на /bid
+        waiter = self.api.expect(("chat", user_id), lambda p: not str(p.get("text", "")).startswith("🔔"))
+        self.api.push_update(update)
+        return await asyncio.wait_for(waiter, RESPONSE_TIMEOUT)
+
+    async def run(self, name: str, action) -> Dict[str, Any]:
+        latencies: List[float] = []
+        accepted = 0
+        timeouts = 0
+        outbound_before = self.api.outbound
+        throttled_before = self.api.throttled
+        queries_before = self.app.db.queries
+
+        async def user_loop(user_id: int):
+            nonlocal accepted, timeouts
+            for _ in range(self.requests):
+                started = time.perf_counter()
+                try:
+                    reply = await action(user_id)
+                except asyncio.TimeoutError:
+                    timeouts += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if str(reply.get("text", "")).startswith("✅ <b>Ваша ставка принята"):
+                    accepted += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user_loop(USER_ID_BASE + i) for i in range(self.users)))
+        # Отложенные уведомления и правки канала — тоже часть нагрузки сценария
+        while self.app.send_queue.pending:
+            await asyncio.sleep(0.1)
+        elapsed = time.perf_counter() - started
+
+        return {
+            "scenario": name,
+            "requests": len(latencies),
+            "timeouts": timeouts,
+            "elapsed_s": round(elapsed, 3),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "bids_per_s": round(accepted / elapsed, 2),
+            "outbound_per_s": round((self.api.outbound - outbound_before) / elapsed, 2),
+            "throttled_429": self.api.throttled - throttled_before,
+            "db_queries": self.app.db.queries - queries_before,
+        }
+
+
+def print_report(results: List[Dict[str, Any]]):
+    for r in results:
+        print(
+            f"📊 {r['scenario']}: {r['requests']} ответов за {r['elapsed_s']} с "
+            f"(таймаутов {r['timeouts']})\n"
+            f"   p50 {r['p50_ms']} мс, p95 {r['p95_ms']} мс, p99 {r['p99_ms']} мс\n"
+            f"   ставок/с {r['bids_per_s']}, исходящих/с {r['outbound_per_s']}, "
+            f"429: {r['throttled_429']}, запросов к БД {r['db_queries']}"
+        )
+
+
+async def main(args):
+    api = FakeBotAPI(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429)
+    os.environ["TELEGRAM_API_SERVER"] = await api.start(port=args.api_port)
+
+    # Импорт после настройки адреса Bot API: бот создаётся при импорте модуля
+    import bot as app
+
+    await app.on_startup(app.dp)
+    polling = asyncio.create_task(app.dp.start_polling(timeout=1))
+    try:
+        auction_ids = args.auction or list(app.auctions.auctions)
+        if not auction_ids:
+            print("❌ Нет активных лотов: запустите seed-данные или передайте --auction")
+            return
+
+        gen = LoadGenerator(app, api, auction_ids, args.users, args.requests)
+        scenarios = {"join": [("join", gen.join)], "bid": [("bid", gen.bid)],
+                     "mixed": [("join", gen.join), ("bid", gen.bid)]}[args.scenario]
+
+        results = [await gen.run(name, action) for name, action in scenarios]
+        print_report(results)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+    finally:
+        app.dp.stop_polling()
+        await polling
+        await app.on_shutdown(app.dp)
+        await api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота «Ценоловер»")
+    parser.add_argument("--scenario", choices=["join", "bid", "mixed"], default="mixed")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=3, help="действий на пользователя")
+    parser.add_argument("--auction", type=int, action="append", help="id лота (по умолчанию все активные)")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка Bot API, с")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--json", help="сохранить результаты в файл")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,80 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class LotCache:
+    """Ограниченный по размеру кэш строк лотов с временем жизни.
+
+    Записи хранятся в порядке последнего обращения (LRU), при превышении
+    max_size вытесняются самые давние. ttl — страховка на случай
+    пропущенного уведомления об изменении: устаревшая запись не живёт
+    дольше ttl секунд. Возвращаемые словари общие — не изменяйте их.
+
+    Строку, прочитанную из БД, кладут с токеном, взятым до чтения (token()):
+    если за время чтения лот сбросили или записали (invalidate/clear/update),
+    put() её отбросит.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Поколения для token(): clear() меняет эпоху, invalidate() — поколение лота
+        self.epoch = 0
+        self.generations: Dict[int, int] = {}
+
+    def get(self, auction_id: int) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(auction_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[auction_id]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(auction_id)
+        self.hits += 1
+        return entry[1]
+
+    def token(self, auction_id: int) -> Tuple[int, int]:
+        return self.epoch, self.generations.get(auction_id, 0)
+
+    def put(self, auction_id: int, lot: Dict[str, Any], token: Optional[Tuple[int, int]] = None):
+        if token is not None and token != self.token(auction_id):
+            # Лот сбросили, пока его читали из БД — строка могла устареть
+            return
+        self.entries[auction_id] = (time.monotonic() + self.ttl, lot)
+        self.entries.move_to_end(auction_id)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def _bump(self, auction_id: int):
+        self.generations[auction_id] = self.generations.get(auction_id, 0) + 1
+        if len(self.generations) > self.max_size * 10:
+            # Смена эпохи тоже делает недействительными все выданные токены
+            self.generations.clear()
+            self.epoch += 1
+
+    def update(self, auction_id: int, **fields):
+        """Запись через кэш: поменять поля, если лот закэширован.
+
+        Поколение меняется и без записи в кэше: строка, которую сейчас читают
+        из БД, уже старше этой записи, и put() её не примет.
+        """
+        entry = self.entries.get(auction_id)
+        if entry is not None:
+            self.entries[auction_id] = (entry[0], {**entry[1], **fields})
+        self._bump(auction_id)
+
+    def invalidate(self, auction_id: int):
+        self.entries.pop(auction_id, None)
+        self._bump(auction_id)
+
+    def clear(self):
+        self.entries.clear()
+        self.generations.clear()
+        self.epoch += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Set
+
+from send_queue import Priority, SendQueue
+
+logger = logging.getLogger(__name__)
+
+
+class LotOutbids:
+    """Накопленные за окно «перебитые» участники одного лота"""
+    __slots__ = ("name", "price", "users", "last_flush", "handle")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.price = 0.0
+        self.users: Set[int] = set()
+        self.last_flush = 0.0
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+
+class OutbidNotifier:
+    """Уведомления о перебитых ставках с объединением по окну.
+
+    Уведомляется только тот, кто потерял лидерство. Все ставки по лоту за
+    окно window сворачиваются в одно сообщение «цена теперь X» на
+    пользователя; тот, кто успел сделать новую ставку, сообщение не получает.
+    """
+
+    def __init__(self, send_queue: SendQueue, window: float = 5.0):
+        self.send_queue = send_queue
+        self.window = window
+        self.lots: Dict[int, LotOutbids] = {}
+        self.sent = 0
+
+    def on_bid(self, auction_id: int, lot_name: str, bidder_id: int, amount: float,
+               previous_leader_id: Optional[int]):
+        """Учёт принятой ставки; отправка — не чаще раза в окно по лоту"""
+        state = self.lots.get(auction_id)
+        if state is None:
+            state = LotOutbids(lot_name)
+            self.lots[auction_id] = state
+
+        state.price = amount
+        state.users.discard(bidder_id)
+        if previous_leader_id is not None and previous_leader_id != bidder_id:
+            state.users.add(previous_leader_id)
+
+        if not state.users or state.handle is not None:
+            return
+
+        delay = state.last_flush + self.window - time.monotonic()
+        loop = asyncio.get_running_loop()
+        if delay <= 0:
+            state.handle = loop.call_soon(self._flush, auction_id)
+        else:
+            state.handle = loop.call_later(delay, self._flush, auction_id)
+
+    def _flush(self, auction_id: int):
+        state = self.lots.get(auction_id)
+        if state is None:
+            return
+        state.handle = None
+        state.last_flush = time.monotonic()
+
+        if not state.users:
+            return
+
+        text = (
+            f"🔔 <b>Вашу ставку перебили на аукционе №{auction_id}</b>\n\n"
+            f"📦 <b>Товар:</b> {state.name}\n"
+            f"💰 <b>Цена сейчас:</b> {state.price}₽\n\n"
+            f"<i>Сделайте новую ставку выше текущей.</i>"
+        )
+        for user_id in state.users:
+            self.send_queue.send_message(user_id, text, Priority.OUTBID, parse_mode="HTML")
+        self.sent += len(state.users)
+        logger.info(f"📨 Уведомления о перебитой ставке по аукциону {auction_id}: {len(state.users)}")
+        state.users = set()
+
+    def forget(self, auction_id: int):
+        """Сброс состояния лота (после закрытия аукциона)"""
+        state = self.lots.pop(auction_id, None)
+        if state is not None and state.handle is not None:
+            state.handle.cancel()
+
+    def close(self):
+        """Немедленная отправка всех накопленных уведомлений"""
+        for auction_id, state in list(self.lots.items()):
+            if state.handle is not None:
+                state.handle.cancel()
+                self._flush(auction_id)
+        self.lots.clear()
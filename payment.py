@@ -1,7 +1,13 @@
+import asyncio
+import hashlib
+import hmac
+import json
 import logging
-from typing import Tuple
+from typing import Dict, List, Tuple
 from io import BytesIO
 
+import aiohttp
+
 logger = logging.getLogger(__name__)
 
 async def generate_payment_url(auction_id: int, user_id: int, amount: float) -> Tuple[str, str]:
@@ -16,7 +22,40 @@ async def check_payment_status(payment_id: str) -> str:
     logger.info(f"🔍 Проверка статуса платежа: {payment_id}")
     return "succeeded"
 
+async def check_payment_statuses(payment_ids: List[str], concurrency: int = 10) -> Dict[str, str]:
+    """Статусы пачки платежей, не больше concurrency запросов к провайдеру одновременно"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check(payment_id: str) -> str:
+        async with semaphore:
+            try:
+                return await check_payment_status(payment_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось проверить платёж {payment_id}: {e}")
+                return "unknown"
+
+    statuses = await asyncio.gather(*(check(pid) for pid in payment_ids))
+    return dict(zip(payment_ids, statuses))
+
 async def generate_qr(payment_url: str) -> BytesIO:
     """Генерация QR-кода (заглушка)"""
     logger.info(f"🖼 Генерация QR-кода для: {payment_url}")
     return BytesIO(b"QR_CODE_STUB")
+
+def sign_payload(body: bytes, secret: str) -> str:
+    """HMAC-SHA256 подпись тела уведомления"""
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+def verify_signature(body: bytes, signature: str, secret: str) -> bool:
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(sign_payload(body, secret), signature)
+
+async def send_fake_notification(webhook_url: str, payment_id: str, status: str, secret: str) -> int:
+    """Локальный «провайдер»: подписанное уведомление о статусе платежа на наш вебхук"""
+    body = json.dumps({"payment_id": payment_id, "status": status}).encode()
+    headers = {"Content-Type": "application/json", "X-Signature": sign_payload(body, secret)}
+    async with aiohttp.ClientSession() as session:
+        async with session.post(webhook_url, data=body, headers=headers) as response:
+            logger.info(f"📤 Тестовое уведомление {payment_id}={status}: HTTP {response.status}")
+            return response.status
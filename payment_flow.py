@@ -0,0 +1,189 @@
+import datetime
+import logging
+from typing import Dict, Optional
+
+from async_db import AsyncDatabase
+from google_sheets import append_report_row
+from payment import check_payment_status, check_payment_statuses, generate_payment_url
+from send_queue import Priority, SendQueue
+from timer_service import TimerService
+
+logger = logging.getLogger(__name__)
+
+# Статусы платежа в таблице payments
+PENDING = "pending"
+COMPLETED = "completed"
+EXPIRED = "expired"
+CANCELED = "canceled"
+
+# Статус провайдера -> новый статус платежа
+PROVIDER_TRANSITIONS: Dict[str, str] = {
+    "succeeded": COMPLETED,
+    "canceled": CANCELED,
+}
+
+
+class PaymentFlow:
+    """Оплата победителя как конечный автомат в таблице payments.
+
+    pending -> completed: пришло подтверждение оплаты (on_status);
+    pending -> expired/canceled: истёк срок или платёж отменён — предупреждение
+    неплательщику и счёт следующему по величине ставки участнику.
+
+    Состояние хранится в БД, в памяти только таймер срока на каждый открытый
+    счёт, поэтому закрытие сотни лотов не держит ни одной спящей корутины.
+    """
+
+    def __init__(self, db: AsyncDatabase, timers: TimerService, send_queue: SendQueue,
+                 timeout: datetime.timedelta, ban_days: int):
+        self.db = db
+        self.timers = timers
+        self.send_queue = send_queue
+        self.timeout = timeout
+        self.ban_days = ban_days
+
+    def _schedule_deadline(self, payment_id: str, deadline: datetime.datetime):
+        self.timers.schedule(("payment", payment_id), deadline,
+                             lambda: self.on_deadline(payment_id))
+
+    async def restore(self):
+        """Восстановление сроков открытых счетов после перезапуска"""
+        payments = await self.db.get_pending_payments()
+        for p in payments:
+            deadline = p['deadline'] or datetime.datetime.now()
+            self._schedule_deadline(p['payment_id'], deadline)
+        logger.info(f"💳 Восстановлено ожидающих оплат: {len(payments)}")
+
+    async def start(self, auction_id: int) -> Optional[int]:
+        """Выставить счёт следующему претенденту; возвращает его user_id"""
+        candidate = await self.db.get_next_payment_candidate(auction_id)
+        if not candidate:
+            await self.db.set_winner(auction_id, None)
+            logger.info(f"📭 Аукцион {auction_id}: претендентов на оплату не осталось")
+            return None
+
+        user_id = candidate['user_id']
+        amount = float(candidate['amount'])
+        payment_url, payment_id = await generate_payment_url(auction_id, user_id, amount)
+        deadline = datetime.datetime.now() + self.timeout
+
+        await self.db.create_payment(auction_id, user_id, amount, payment_id, deadline)
+        self._schedule_deadline(payment_id, deadline)
+
+        minutes = int(self.timeout.total_seconds() // 60)
+        self.send_queue.send_message(
+            user_id,
+            f"🏆 <b>Поздравляем! Вы выиграли аукцион №{auction_id}</b>\n\n"
+            f"💰 <b>Сумма к оплате:</b> {amount}₽\n"
+            f"⏰ <b>Время на оплату:</b> {minutes} минут\n\n"
+            f"💳 <a href='{payment_url}'>Оплатить</a>",
+            Priority.PAYMENT,
+            parse_mode="HTML"
+        )
+        logger.info(f"💳 Аукцион {auction_id}: счёт {payment_id} на {amount}₽ пользователю {user_id}")
+        return user_id
+
+    async def on_status(self, payment_id: str, status: str) -> bool:
+        """Событие от провайдера: succeeded / canceled. Возвращает True, если статус сменился"""
+        new_status = PROVIDER_TRANSITIONS.get(status)
+        if new_status is None:
+            return False
+
+        payment = await self.db.transition_payment(payment_id, PENDING, new_status)
+        if not payment:
+            return False
+        await self.apply(payment)
+        return True
+
+    async def apply(self, payment):
+        """Последствия уже записанного в БД перехода платежа"""
+        self.timers.cancel(("payment", payment['payment_id']))
+        if payment['payment_status'] == COMPLETED:
+            await self._on_completed(payment)
+        elif payment['payment_status'] == CANCELED:
+            await self._on_failed(payment, "❌ Платёж отменён.")
+
+    async def on_deadline(self, payment_id: str):
+        """Срок оплаты истёк: последняя сверка с провайдером, затем переход к следующему"""
+        status = await check_payment_status(payment_id)
+        if await self.on_status(payment_id, status):
+            return
+
+        payment = await self.db.transition_payment(payment_id, PENDING, EXPIRED)
+        if payment:
+            await self._on_failed(
+                payment,
+                "⏰ Время оплаты истекло. Результат аукциона пересмотрен, "
+                "вы получили предупреждение."
+            )
+
+    async def _on_completed(self, payment):
+        auction_id = payment['auction_id']
+        user_id = payment['user_id']
+        self.send_queue.send_message(
+            user_id,
+            f"✅ <b>Оплата по аукциону №{auction_id} получена!</b>\n\n"
+            f"<i>Спасибо за участие в «Ценоловере»</i>",
+            Priority.PAYMENT,
+            parse_mode="HTML"
+        )
+        lot = await self.db.get_lot(auction_id)
+        if lot:
+            try:
+                await append_report_row(auction_id, lot['name'], lot['article'], lot['start_price'],
+                                        payment['amount'], "Оплата совершена")
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи в отчет: {e}")
+        logger.info(f"✅ Оплата подтверждена для аукциона {auction_id}")
+
+    async def _on_failed(self, payment, text: str):
+        auction_id = payment['auction_id']
+        user_id = payment['user_id']
+        await self.db.add_warning_auto_ban(user_id, self.ban_days)
+        self.send_queue.send_message(user_id, text, Priority.PAYMENT)
+        logger.warning(f"⏰ Неоплата: пользователь {user_id}, аукцион {auction_id}")
+        await self.start(auction_id)
+
+
+class PaymentReconciler:
+    """Периодическая сверка всех ожидающих платежей пачками.
+
+    Статусы запрашиваются у провайдера пачками по batch_size с ограничением
+    параллельности, а переходы каждой пачки пишутся в БД одним запросом.
+    """
+
+    def __init__(self, db: AsyncDatabase, flow: PaymentFlow,
+                 batch_size: int = 100, concurrency: int = 10):
+        self.db = db
+        self.flow = flow
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    async def run(self):
+        try:
+            pending = await self.db.get_pending_payments()
+            changed = 0
+            for i in range(0, len(pending), self.batch_size):
+                batch = [p['payment_id'] for p in pending[i:i + self.batch_size]]
+                statuses = await check_payment_statuses(batch, self.concurrency)
+
+                payment_ids, new_statuses = [], []
+                for payment_id, status in statuses.items():
+                    if status in PROVIDER_TRANSITIONS:
+                        payment_ids.append(payment_id)
+                        new_statuses.append(PROVIDER_TRANSITIONS[status])
+                if not payment_ids:
+                    continue
+
+                for payment in await self.db.apply_payment_transitions(payment_ids, new_statuses):
+                    changed += 1
+                    try:
+                        await self.flow.apply(payment)
+                    except Exception as e:
+                        logger.error(f"❌ Ошибка обработки платежа {payment['payment_id']}: {e}")
+
+            if pending:
+                logger.info(f"🔍 Сверка платежей: ожидают {len(pending)}, изменилось {changed}")
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка сверки платежей: {e}")
@@ -1,61 +1,354 @@
 import asyncio
+import logging
 import time
-from collections import defaultdict
-from typing import Dict, Tuple
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
 
 from aiogram import Dispatcher, types
+from aiogram.dispatcher.handler import CancelHandler
 from aiogram.dispatcher.middlewares import BaseMiddleware
+from redis import asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+
+class RouteLimit:
+    """Бюджет маршрута: limit единиц стоимости за window секунд"""
+    __slots__ = ("limit", "window")
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+
+
+# Ставки дешёвые, но жёстко ограничены; навигация по меню — свободнее
+DEFAULT_ROUTES: Dict[str, RouteLimit] = {
+    "bid": RouteLimit(limit=3, window=1),
+    "menu": RouteLimit(limit=20, window=5),
+}
+
+# Стоимость тяжёлых запросов внутри маршрута (по умолчанию 1)
+CALLBACK_COSTS: Dict[str, int] = {
+    "my_auctions": 5,  # агрегирующий запрос по ставкам пользователя
+    "view_auctions": 2,
+    "join_menu": 2,
+}
+
+MENU_CALLBACKS = {"view_auctions", "join_menu", "my_auctions", "help", "back_to_main"}
+
+
+def route_for_message(message: types.Message) -> Tuple[str, int]:
+    text = message.text or ""
+    if text.startswith("/bid ") or text == "/bid":
+        return "bid", 1
+    return "default", 1
+
+
+def route_for_callback(callback_query: types.CallbackQuery) -> Tuple[str, int]:
+    data = callback_query.data or ""
+    if data.startswith("bidquick:"):
+        return "bid", 1
+    # Страницы списков: "view_auctions:n:<id>" и т.п.
+    menu = data.split(":", 1)[0]
+    if menu in MENU_CALLBACKS or data.startswith("join:"):
+        return "menu", CALLBACK_COSTS.get(menu, 1)
+    return "default", 1
+
+
+class WindowCounter:
+    """Скользящее окно на двух счётчиках: текущее и предыдущее окно"""
+    __slots__ = ("index", "current", "previous")
+
+    def __init__(self, index: int):
+        self.index = index
+        self.current = 0
+        self.previous = 0
+
+    def hit(self, now: float, window: float, limit: int, cost: int = 1) -> bool:
+        """Учесть запрос стоимостью cost; False — лимит превышен"""
+        index = int(now // window)
+        if index != self.index:
+            self.previous = self.current if index - self.index == 1 else 0
+            self.current = 0
+            self.index = index
+
+        # Доля предыдущего окна, ещё попадающая в скользящее окно
+        weight = 1 - (now - index * window) / window
+        if self.previous * weight + self.current + cost > limit:
+            return False
+
+        self.current += cost
+        return True
+
+    def is_idle(self, now: float, window: float) -> bool:
+        return int(now // window) - self.index >= 2
+
 
 class RateLimitMiddleware(BaseMiddleware):
-    def __init__(self, limit: int = 5, window: int = 1):
+    """Лимит запросов на пользователя и маршрут с постоянной памятью на запись.
+
+    У каждого маршрута (ставки, меню, прочее) свой бюджет, запросы имеют
+    стоимость, админы не ограничиваются. Записи хранятся в порядке
+    последнего обращения (LRU): простаивающие вычищаются с начала словаря
+    при периодическом проходе, при превышении max_users вытесняются самые
+    давние. Об ограничении пользователь узнаёт не чаще раза за окно,
+    остальные лишние апдейты отбрасываются молча — без вызовов Bot API.
+    """
+
+    def __init__(self, limit: int = 5, window: int = 1, max_users: int = 100_000,
+                 sweep_every: int = 1000, routes: Optional[Dict[str, RouteLimit]] = None,
+                 admin_ids: Iterable[int] = ()):
         super().__init__()
-        self.limit = limit  # максимальное количество запросов
-        self.window = window  # окно времени в секундах
-        self.user_requests: Dict[int, list] = defaultdict(list)
+        self.routes = dict(DEFAULT_ROUTES if routes is None else routes)
+        # limit/window — бюджет маршрута по умолчанию
+        self.routes.setdefault("default", RouteLimit(limit, window))
+        self.admin_ids = set(admin_ids)
+        self.max_users = max_users
+        self.sweep_every = sweep_every
+        self.counters: "OrderedDict[Tuple[str, int], WindowCounter]" = OrderedDict()
+        self.notified: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+        self.dropped = 0
+        self._since_sweep = 0
+
+    def _sweep(self, now: float):
+        while self.counters:
+            key, counter = next(iter(self.counters.items()))
+            if not counter.is_idle(now, (self.routes.get(key[0]) or self.routes["default"]).window):
+                break
+            del self.counters[key]
+
+    def check(self, user_id: int, route: str = "default", cost: int = 1) -> bool:
+        now = time.monotonic()
+        budget = self.routes.get(route) or self.routes["default"]
+
+        self._since_sweep += 1
+        if self._since_sweep >= self.sweep_every:
+            self._since_sweep = 0
+            self._sweep(now)
+
+        key = (route, user_id)
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = WindowCounter(int(now // budget.window))
+            self.counters[key] = counter
+            if len(self.counters) > self.max_users:
+                self.counters.popitem(last=False)
+        else:
+            self.counters.move_to_end(key)
+
+        return counter.hit(now, budget.window, budget.limit, cost)
+
+    async def allow(self, user_id: int, route: str = "default", cost: int = 1) -> bool:
+        return self.check(user_id, route, cost)
+
+    async def close(self):
+        pass
+
+    def should_notify(self, user_id: int, route: str = "default") -> bool:
+        """Предупреждать об ограничении маршрута не чаще раза за его окно"""
+        budget = self.routes.get(route) or self.routes["default"]
+        index = int(time.monotonic() // budget.window)
+        key = (route, user_id)
+        if self.notified.get(key) == index:
+            return False
+        self.notified[key] = index
+        self.notified.move_to_end(key)
+        if len(self.notified) > self.max_users:
+            self.notified.popitem(last=False)
+        return True
 
     async def on_pre_process_message(self, message: types.Message, data: dict):
         user_id = message.from_user.id
-        current_time = time.time()
-        
-        # Очищаем старые запросы
-        self.user_requests[user_id] = [
-            req_time for req_time in self.user_requests[user_id]
-            if current_time - req_time < self.window
-        ]
-        
-        # Проверяем лимит
-        if len(self.user_requests[user_id]) >= self.limit:
+        if user_id in self.admin_ids:
+            return
+        route, cost = route_for_message(message)
+        if await self.allow(user_id, route, cost):
+            return
+
+        self.dropped += 1
+        if self.should_notify(user_id, route):
             await message.answer(
                 "⚠️ <b>Слишком много запросов!</b>\n\n"
                 "Пожалуйста, подождите несколько секунд.",
                 parse_mode="HTML"
             )
-            raise Exception("Rate limit exceeded")
-        
-        # Добавляем новый запрос
-        self.user_requests[user_id].append(current_time)
+        raise CancelHandler()
 
     async def on_pre_process_callback_query(self, callback_query: types.CallbackQuery, data: dict):
         user_id = callback_query.from_user.id
-        current_time = time.time()
-        
-        # Очищаем старые запросы
-        self.user_requests[user_id] = [
-            req_time for req_time in self.user_requests[user_id]
-            if current_time - req_time < self.window
-        ]
-        
-        # Проверяем лимит
-        if len(self.user_requests[user_id]) >= self.limit:
+        if user_id in self.admin_ids:
+            return
+        route, cost = route_for_callback(callback_query)
+        if await self.allow(user_id, route, cost):
+            return
+
+        self.dropped += 1
+        if self.should_notify(user_id, route):
             await callback_query.answer(
                 "Слишком много запросов! Подождите...",
                 show_alert=True
             )
-            raise Exception("Rate limit exceeded")
-        
-        # Добавляем новый запрос
-        self.user_requests[user_id].append(current_time)
+        raise CancelHandler()
+
+
+# Скользящее окно на двух счётчиках в Redis: проверка и инкремент атомарно.
+# KEYS[1] — счётчик текущего окна, KEYS[2] — предыдущего;
+# ARGV: now_ms, window_ms, limit, cost, lease_share. Вместе с запросом резервируется
+# аренда — доля lease_share оставшегося запаса, чтобы её видели все экземпляры.
+# Возвращает {разрешено, оценка после запроса, размер аренды}.
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local share = tonumber(ARGV[5])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local weight = 1 - (now % window) / window
+local estimate = previous * weight + current
+if estimate + cost > limit then
+    return {0, math.floor(estimate), 0}
+end
+local lease = math.floor((limit - estimate - cost) * share)
+if lease < 0 then
+    lease = 0
+end
+redis.call('INCRBY', KEYS[1], cost + lease)
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return {1, math.floor(estimate + cost), lease}
+"""
+
+# Возврат неиспользованной аренды: KEYS[1] — счётчик окна, ARGV[1] — сколько вернуть.
+# Истёкший счётчик не трогаем, чтобы не создать ключ без TTL.
+REFUND_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('DECRBY', KEYS[1], tonumber(ARGV[1]))
+end
+return 0
+"""
+
+
+class Lease:
+    """Зарезервированный в Redis остаток лимита пользователя в текущем окне"""
+    __slots__ = ("index", "tokens")
+
+    def __init__(self, index: int, tokens: int):
+        self.index = index
+        self.tokens = tokens
+
+
+class RedisRateLimitMiddleware(RateLimitMiddleware):
+    """Общий для всех экземпляров бота лимит в Redis.
+
+    Проверка — один вызов Lua-скрипта (EVALSHA). Если после него у
+    пользователя остаётся заметный запас, скрипт сразу резервирует в Redis
+    его часть (lease_share) — аренду этого экземпляра до конца окна: такие
+    запросы проходят без похода в Redis, а другие экземпляры уже видят
+    аренду в счётчике. Неиспользованный остаток аренды фоном возвращается
+    одним конвейером (pipeline). При недоступности Redis используется
+    локальный лимит.
+    """
+
+    def __init__(self, redis: aioredis.Redis, limit: int = 5, window: int = 1,
+                 prefix: str = "auction_rl", lease_share: float = 0.5,
+                 flush_interval: float = 0.1, **kwargs):
+        super().__init__(limit=limit, window=window, **kwargs)
+        self.redis = redis
+        self.prefix = prefix
+        self.lease_share = lease_share
+        self.flush_interval = flush_interval
+        self.script = redis.register_script(SLIDING_WINDOW_SCRIPT)
+        self.refund_script = redis.register_script(REFUND_SCRIPT)
+        self.leases: Dict[Tuple[str, int], Lease] = {}
+        # Неиспользованные аренды к возврату: (route, user_id, index) -> токены
+        self._refunds: Dict[Tuple[str, int, int], int] = {}
+        self._lease_index = 0
+        self._flusher: Optional[asyncio.Task] = None
+
+    def _key(self, route: str, user_id: int, index: int) -> str:
+        return f"{self.prefix}:{route}:{user_id}:{index}"
+
+    def _release_lease(self, lease_key: Tuple[str, int]):
+        lease = self.leases.pop(lease_key, None)
+        if lease is not None and lease.tokens > 0:
+            key = (lease_key[0], lease_key[1], lease.index)
+            self._refunds[key] = self._refunds.get(key, 0) + lease.tokens
+
+    async def allow(self, user_id: int, route: str = "default", cost: int = 1) -> bool:
+        budget = self.routes.get(route) or self.routes["default"]
+        now = time.time()
+        index = int(now // budget.window)
+
+        lease_key = (route, user_id)
+        lease = self.leases.get(lease_key)
+        if lease is not None and lease.index == index and lease.tokens >= cost:
+            # Токены аренды уже учтены в Redis
+            lease.tokens -= cost
+            return True
+        self._release_lease(lease_key)
+
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+        try:
+            allowed, _, tokens = await self.script(
+                keys=[self._key(route, user_id, index), self._key(route, user_id, index - 1)],
+                args=[int(now * 1000), int(budget.window * 1000), budget.limit, cost,
+                      self.lease_share]
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Redis недоступен для лимита запросов, локальная проверка: {e}")
+            return self.check(user_id, route, cost)
+
+        if not allowed:
+            return False
+        if int(tokens) > 0:
+            self.leases[lease_key] = Lease(index, int(tokens))
+        return True
+
+    async def _flush(self, release_all: bool = False):
+        # Аренды прошлых окон больше не действуют; чистим раз в окно маршрута по умолчанию
+        now = time.time()
+        index = int(now // self.routes["default"].window)
+        if index != self._lease_index or release_all:
+            self._lease_index = index
+            for key, lease in list(self.leases.items()):
+                window = (self.routes.get(key[0]) or self.routes["default"]).window
+                if release_all or lease.index != int(now // window):
+                    self._release_lease(key)
+
+        refunds, self._refunds = self._refunds, {}
+        if refunds:
+            pipe = self.redis.pipeline(transaction=False)
+            for (route, user_id, index), tokens in refunds.items():
+                await self.refund_script(keys=[self._key(route, user_id, index)], args=[tokens],
+                                         client=pipe)
+            try:
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось вернуть неиспользованные аренды в Redis: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self._flush(release_all=True)
+
 
-def setup_rate_limit(dp: Dispatcher):
-    rate_limit_middleware = RateLimitMiddleware(limit=10, window=1)  # 10 запросов в секунду
+def setup_rate_limit(dp: Dispatcher, redis: Optional[aioredis.Redis] = None,
+                     admin_ids: Iterable[int] = ()) -> RateLimitMiddleware:
+    # Прочие запросы — 10 в секунду; ставки и меню — по DEFAULT_ROUTES.
+    # С Redis лимит общий для всех экземпляров бота
+    if redis is not None:
+        rate_limit_middleware = RedisRateLimitMiddleware(redis, limit=10, window=1, admin_ids=admin_ids)
+    else:
+        rate_limit_middleware = RateLimitMiddleware(limit=10, window=1, admin_ids=admin_ids)
     dp.middleware.setup(rate_limit_middleware)
+    dp['rate_limiter'] = rate_limit_middleware
+    return rate_limit_middleware
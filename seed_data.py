@@ -0,0 +1,283 @@
+"""Генератор тестовых данных для замеров: users, lots, bids, payments, notifications.
+
+Распределения близки к реальным: активность участников по степенному
+закону (немногие делают большинство ставок), популярность лотов тоже,
+ставки сгущаются к концу аукциона, лоты есть во всех статусах. Данные
+грузятся через COPY (copy_records_to_table) пачками по --chunk строк.
+Одинаковый --seed даёт одинаковые данные; время отсчитывается от момента
+запуска, чтобы статусы лотов соответствовали текущему времени.
+
+Пример: python seed_data.py --db-uri postgresql://localhost/auction_bench --users 200k --lots 20k --bids 10M --truncate
+"""
+import argparse
+import asyncio
+import bisect
+import datetime
+import itertools
+import logging
+import random
+import time
+from typing import Iterator, List, Sequence, Tuple
+
+from async_db import AsyncDatabase
+from config import DB_URI, MIN_STEP
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+USER_ID_BASE = 1_000_000
+AUCTION_DURATION = datetime.timedelta(hours=12)
+# Доли лотов по статусам
+STATUS_WEIGHTS = (("finished", 0.7), ("active", 0.1), ("pending", 0.2))
+# Итог оплаты завершённых лотов
+PAYMENT_WEIGHTS = (("completed", 0.8), ("expired", 0.1), ("canceled", 0.05), ("pending", 0.05))
+# Вторичные индексы ставок: на время загрузки удаляются, потом init_tables создаёт их снова
+BID_INDEXES = ("idx_bids_auction_id", "idx_bids_user_id")
+
+USER_COLUMNS = ("user_id", "user_name", "warnings", "banned_until", "created_at")
+LOT_COLUMNS = ("auction_id", "name", "article", "start_price", "current_price", "images",
+               "video_url", "description", "start_time", "end_time", "status",
+               "winner_user_id", "created_at")
+BID_COLUMNS = ("auction_id", "user_id", "amount", "created_at")
+PAYMENT_COLUMNS = ("auction_id", "user_id", "amount", "payment_status", "payment_id",
+                   "paid_at", "deadline", "created_at")
+NOTIFICATION_COLUMNS = ("user_id", "auction_id", "notification_type", "sent_at")
+
+
+def parse_count(value: str) -> int:
+    """1000, 100k, 10M"""
+    value = value.strip().lower()
+    for suffix, factor in (("k", 1_000), ("m", 1_000_000)):
+        if value.endswith(suffix):
+            return int(float(value[:-1]) * factor)
+    return int(value)
+
+
+def zipf_cum_weights(n: int, s: float) -> List[float]:
+    """Накопленные веса степенного закона: i-й по популярности ~ 1 / i^s"""
+    return list(itertools.accumulate(1 / (i ** s) for i in range(1, n + 1)))
+
+
+def split_by_weights(total: int, cum_weights: Sequence[float]) -> List[int]:
+    """Разбить total на части пропорционально весам (детерминированно)"""
+    weights = [cum_weights[0]] + [b - a for a, b in zip(cum_weights, cum_weights[1:])]
+    scale = total / cum_weights[-1]
+    counts = [int(w * scale) for w in weights]
+    for i in range(total - sum(counts)):
+        counts[i % len(counts)] += 1
+    return counts
+
+
+def weighted_choice(rng: random.Random, weights: Sequence[Tuple[str, float]]) -> str:
+    r = rng.random()
+    for value, weight in weights:
+        if r < weight:
+            return value
+        r -= weight
+    return weights[-1][0]
+
+
+class Seeder:
+    def __init__(self, db: AsyncDatabase, seed: int, users: int, lots: int, bids: int,
+                 chunk: int, bidder_skew: float, lot_skew: float):
+        self.db = db
+        self.rng = random.Random(seed)
+        self.users = users
+        self.lots = lots
+        self.bids = bids
+        self.chunk = chunk
+        self.bidder_skew = bidder_skew
+        self.lot_skew = lot_skew
+        self.now = datetime.datetime.now().replace(microsecond=0)
+        self.user_ids = [USER_ID_BASE + i for i in range(users)]
+        # Участники в случайном порядке популярности
+        self.bidder_order = self.user_ids[:]
+        self.rng.shuffle(self.bidder_order)
+        self.bidder_cum = zipf_cum_weights(users, bidder_skew)
+        # auction_id -> (status, start_price, start_time, end_time)
+        self.lot_meta = {}
+
+    async def copy(self, table: str, columns: Sequence[str], records: Iterator[tuple]) -> int:
+        total = 0
+        async with self.db.pool.acquire() as connection:
+            while True:
+                chunk = list(itertools.islice(records, self.chunk))
+                if not chunk:
+                    break
+                await connection.copy_records_to_table(table, records=chunk, columns=columns)
+                total += len(chunk)
+                if total % (self.chunk * 10) == 0:
+                    logger.info(f"   {table}: {total}")
+        logger.info(f"✅ {table}: {total}")
+        return total
+
+    def _user_records(self) -> Iterator[tuple]:
+        rng = self.rng
+        for user_id in self.user_ids:
+            warnings = 0 if rng.random() < 0.95 else rng.randint(1, 3)
+            banned_until = self.now + datetime.timedelta(days=rng.randint(1, 7)) if warnings >= 3 else None
+            created_at = self.now - datetime.timedelta(days=rng.uniform(0, 365))
+            yield user_id, f"user{user_id}", warnings, banned_until, created_at
+
+    def _lot_times(self, status: str) -> Tuple[datetime.datetime, datetime.datetime]:
+        rng = self.rng
+        if status == "finished":
+            end = self.now - datetime.timedelta(hours=rng.uniform(1, 24 * 180))
+        elif status == "active":
+            end = self.now + datetime.timedelta(minutes=rng.uniform(1, AUCTION_DURATION.total_seconds() / 60))
+        else:
+            end = self.now + AUCTION_DURATION + datetime.timedelta(hours=rng.uniform(0, 72))
+        return end - AUCTION_DURATION, end
+
+    def _plan_lots(self):
+        for auction_id in range(1, self.lots + 1):
+            status = weighted_choice(self.rng, STATUS_WEIGHTS)
+            start_price = float(self.rng.randint(5, 500) * 100)
+            start_time, end_time = self._lot_times(status)
+            self.lot_meta[auction_id] = (status, start_price, start_time, end_time)
+
+    def _bid_times(self, n: int, start: datetime.datetime, end: datetime.datetime) -> List[datetime.datetime]:
+        """n моментов ставок со сгущением к концу аукциона"""
+        last = min(end, self.now)
+        span = (last - start).total_seconds()
+        # u**3 — большая часть ставок в последних процентах времени
+        offsets = sorted(span * (self.rng.random() ** 3) for _ in range(n))
+        return [last - datetime.timedelta(seconds=o) for o in reversed(offsets)]
+
+    def _bid_records(self, bids_per_lot: dict, leaders: dict) -> Iterator[tuple]:
+        rng = self.rng
+        order = self.bidder_order
+        cum = self.bidder_cum
+        top = cum[-1]
+        for auction_id, n in bids_per_lot.items():
+            status, start_price, start_time, end_time = self.lot_meta[auction_id]
+            amount = start_price
+            user_id = None
+            for created_at in self._bid_times(n, start_time, end_time):
+                amount += MIN_STEP * rng.randint(1, 3)
+                user_id = order[bisect.bisect_left(cum, rng.random() * top)]
+                yield auction_id, user_id, amount, created_at
+            leaders[auction_id] = (user_id, amount)
+
+    def _lot_records(self) -> Iterator[tuple]:
+        """Лоты без итоговой цены и победителя — их проставляет run() после ставок"""
+        rng = self.rng
+        for auction_id, (status, start_price, start_time, end_time) in self.lot_meta.items():
+            images = '["https://example.com/img/%d.jpg"]' % auction_id
+            yield (auction_id, f"Лот {auction_id}", f"ART-{auction_id:07d}", start_price,
+                   start_price, images, None, f"Описание лота {auction_id}", start_time,
+                   end_time, status, None,
+                   start_time - datetime.timedelta(days=rng.uniform(0, 7)))
+
+    def _payment_records(self, leaders: dict, winners: dict) -> Iterator[tuple]:
+        rng = self.rng
+        for auction_id, (user_id, amount) in leaders.items():
+            status, _, _, end_time = self.lot_meta[auction_id]
+            if status != "finished":
+                continue
+            payment_status = weighted_choice(rng, PAYMENT_WEIGHTS)
+            if payment_status == "pending":
+                created_at = self.now - datetime.timedelta(minutes=rng.uniform(0, 10))
+            else:
+                created_at = end_time
+            deadline = created_at + datetime.timedelta(minutes=15)
+            paid_at = created_at + datetime.timedelta(minutes=rng.uniform(1, 15)) \
+                if payment_status == "completed" else None
+            if payment_status in ("completed", "pending"):
+                winners[auction_id] = user_id
+            yield (auction_id, user_id, amount, payment_status, f"pay_{auction_id}_{user_id}",
+                   paid_at, deadline, created_at)
+
+    def _notification_records(self, leaders: dict) -> Iterator[tuple]:
+        rng = self.rng
+        order = self.bidder_order
+        cum = self.bidder_cum
+        top = cum[-1]
+        for auction_id, (user_id, _) in leaders.items():
+            status, _, start_time, end_time = self.lot_meta[auction_id]
+            for _ in range(rng.randint(0, 5)):
+                outbid = order[bisect.bisect_left(cum, rng.random() * top)]
+                sent_at = start_time + (min(end_time, self.now) - start_time) * rng.random()
+                yield outbid, auction_id, "outbid", sent_at
+            if status == "finished":
+                yield user_id, auction_id, "win", end_time
+
+    async def run(self, truncate: bool, keep_indexes: bool):
+        await self.db.initialize()
+        if truncate:
+            await self.db.execute(
+                "TRUNCATE users, lots, bids, payments, notifications RESTART IDENTITY CASCADE"
+            )
+
+        started = time.monotonic()
+        self._plan_lots()
+        with_bids = [a for a, meta in self.lot_meta.items() if meta[0] != "pending"]
+        self.rng.shuffle(with_bids)
+        counts = split_by_weights(self.bids, zipf_cum_weights(len(with_bids), self.lot_skew)) \
+            if with_bids else []
+        bids_per_lot = {a: n for a, n in zip(with_bids, counts) if n}
+
+        await self.copy("users", USER_COLUMNS, self._user_records())
+
+        # Ставки ссылаются на лоты, поэтому лоты грузятся первыми
+        await self.copy("lots", LOT_COLUMNS, self._lot_records())
+
+        leaders: dict = {}
+        winners: dict = {}
+
+        if not keep_indexes:
+            for index in BID_INDEXES:
+                await self.db.execute(f"DROP INDEX IF EXISTS {index}")
+        await self.copy("bids", BID_COLUMNS, self._bid_records(bids_per_lot, leaders))
+        await self.db.rebuild_participants()
+        await self.copy("payments", PAYMENT_COLUMNS, self._payment_records(leaders, winners))
+        await self.copy("notifications", NOTIFICATION_COLUMNS, self._notification_records(leaders))
+
+        # Цена, лидер и победитель лотов — одним запросом
+        auction_ids = list(leaders)
+        await self.db.execute(
+            """\
+UPDATE lots l
+SET current_price = t.price, winner_user_id = t.winner, leader_user_id = t.leader
+FROM unnest($1::int[], $2::numeric[], $3::bigint[], $4::bigint[]) AS t(auction_id, price, winner, leader)
+WHERE l.auction_id = t.auction_id\
+            """,
+            auction_ids, [leaders[a][1] for a in auction_ids], [winners.get(a) for a in auction_ids],
+            [leaders[a][0] for a in auction_ids]
+        )
+
+        logger.info("🔧 Индексы и статистика...")
+        await self.db.init_tables()
+        await self.db.execute("ANALYZE users, lots, bids, lot_participants, payments, notifications")
+        await self.db.close()
+        logger.info(f"🏁 Готово за {time.monotonic() - started:.1f} с")
+
+
+async def main(args):
+    seeder = Seeder(
+        AsyncDatabase(args.db_uri),
+        seed=args.seed,
+        users=parse_count(args.users),
+        lots=parse_count(args.lots),
+        bids=parse_count(args.bids),
+        chunk=args.chunk,
+        bidder_skew=args.bidder_skew,
+        lot_skew=args.lot_skew
+    )
+    await seeder.run(args.truncate, args.keep_indexes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Тестовые данные для замеров «Ценоловера»")
+    parser.add_argument("--db-uri", default=DB_URI)
+    parser.add_argument("--users", default="10k")
+    parser.add_argument("--lots", default="1k")
+    parser.add_argument("--bids", default="100k", help="например 1k, 100k, 10M")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--chunk", type=int, default=100_000, help="строк в одном COPY")
+    parser.add_argument("--bidder-skew", type=float, default=1.1, help="показатель степени для участников")
+    parser.add_argument("--lot-skew", type=float, default=0.8, help="показатель степени для лотов")
+    parser.add_argument("--truncate", action="store_true", help="очистить таблицы перед загрузкой")
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="не удалять индексы ставок на время загрузки")
+    asyncio.run(main(parser.parse_args()))
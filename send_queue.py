@@ -0,0 +1,247 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from enum import IntEnum
+from typing import Any, Dict, List, Tuple
+
+from aiogram import Bot
+from aiogram.utils.exceptions import NetworkError, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Сколько раз повторять отправку при сетевых ошибках
+MAX_ATTEMPTS = 3
+# Порог числа чатов, после которого чистим простаивающие корзины
+CHAT_BUCKETS_SWEEP_AT = 10000
+
+
+class Priority(IntEnum):
+    """Классы приоритета исходящих сообщений (меньше — важнее)"""
+    PAYMENT = 0
+    OUTBID = 1
+    BROADCAST = 2
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity"""
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько ждать до появления токена (0 — можно отправлять)"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class SendJob:
+    __slots__ = ("method", "chat_id", "kwargs", "future", "attempts")
+
+    def __init__(self, method: str, chat_id: Any, kwargs: Dict[str, Any], future: asyncio.Future):
+        self.method = method
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.future = future
+        self.attempts = 0
+
+
+class SendQueue:
+    """Очередь исходящих сообщений с лимитами Telegram и приоритетами.
+
+    Глобальная корзина держит общий лимит (~30 сообщений/с), корзины по чатам —
+    лимит на один чат (~1/с). Если чат ещё не готов, задача откладывается
+    и не занимает воркер. RetryAfter блокирует чат на указанное время.
+    В каждом чате в работе не больше одной задачи: остальные ждут своей
+    очереди (по приоритету, затем по порядку постановки), поэтому сообщения
+    одного чата не обгоняют друг друга и не делят один токен корзины чата.
+    """
+
+    def __init__(self, bot: Bot, workers: int = 8, global_rate: float = 30,
+                 per_chat_rate: float = 1):
+        self.bot = bot
+        self.workers_count = workers
+        self.per_chat_rate = per_chat_rate
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_buckets: Dict[Any, TokenBucket] = {}
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        # Чаты, у которых задача в работе: chat_id -> ожидающие задачи этого чата (куча)
+        self._chat_waiting: Dict[Any, List[Tuple[int, int, SendJob]]] = {}
+        self._parked = 0
+        self._seq = itertools.count()
+        self._workers: list = []
+        self._deferred = 0
+        self._active = 0
+        self.sent = 0
+        self.failed = 0
+
+    def enqueue(self, method: str, chat_id: Any, priority: Priority = Priority.BROADCAST,
+                **kwargs) -> asyncio.Future:
+        """Поставить вызов bot.<method>(chat_id=chat_id, **kwargs) в очередь, не дожидаясь отправки"""
+        future = asyncio.get_running_loop().create_future()
+        # Ошибка уже залогирована воркером — не ругаемся на неполученное исключение
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._put(priority, SendJob(method, chat_id, kwargs, future))
+        return future
+
+    def send_message(self, chat_id: Any, text: str, priority: Priority = Priority.BROADCAST,
+                     **kwargs) -> asyncio.Future:
+        return self.enqueue("send_message", chat_id, priority, text=text, **kwargs)
+
+    def _put(self, priority: int, job: SendJob):
+        entry = (priority, next(self._seq), job)
+        waiting = self._chat_waiting.get(job.chat_id)
+        if waiting is not None:
+            # В чате уже есть задача в работе — ждём её завершения
+            heapq.heappush(waiting, entry)
+            self._parked += 1
+            return
+        self._chat_waiting[job.chat_id] = []
+        self.queue.put_nowait(entry)
+
+    def _release(self, chat_id: Any):
+        """Задача чата завершена: в основную очередь идёт следующая задача этого чата"""
+        waiting = self._chat_waiting.get(chat_id)
+        if not waiting:
+            self._chat_waiting.pop(chat_id, None)
+            return
+        self._parked -= 1
+        self.queue.put_nowait(heapq.heappop(waiting))
+
+    def _defer(self, priority: int, job: SendJob, delay: float):
+        self._deferred += 1
+
+        def requeue():
+            # Отложенная задача сохраняет за собой чат и возвращается в основную очередь
+            self._deferred -= 1
+            self.queue.put_nowait((priority, next(self._seq), job))
+
+        asyncio.get_running_loop().call_later(delay, requeue)
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= CHAT_BUCKETS_SWEEP_AT:
+                now = time.monotonic()
+                self.chat_buckets = {
+                    cid: b for cid, b in self.chat_buckets.items() if not b.is_idle(now)
+                }
+            bucket = TokenBucket(self.per_chat_rate, 1)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _worker(self):
+        while True:
+            priority, _, job = await self.queue.get()
+            self._active += 1
+            finished = True
+            try:
+                finished = await self._process(priority, job)
+            except Exception as e:
+                logger.error(f"❌ Ошибка очереди отправки: {e}")
+            finally:
+                self._active -= 1
+                if finished:
+                    self._release(job.chat_id)
+                self.queue.task_done()
+
+    async def _process(self, priority: int, job: SendJob) -> bool:
+        """Обработка задачи; False — задача отложена и держит чат за собой"""
+        if job.future.cancelled():
+            return True
+
+        chat_bucket = self._chat_bucket(job.chat_id)
+        delay = chat_bucket.delay(time.monotonic())
+        if delay > 0:
+            self._defer(priority, job, delay)
+            return False
+        # Токен чата резервируем сразу, до ожидания глобальной корзины
+        chat_bucket.take()
+
+        while True:
+            delay = self.global_bucket.delay(time.monotonic())
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        self.global_bucket.take()
+        job.attempts += 1
+
+        try:
+            # chat_id передаём именованным: так работают и send_*, и edit_message_*
+            result = await getattr(self.bot, job.method)(chat_id=job.chat_id, **job.kwargs)
+        except RetryAfter as e:
+            logger.warning(f"⏳ Telegram просит подождать {e.timeout} с (чат {job.chat_id})")
+            chat_bucket.blocked_until = time.monotonic() + e.timeout
+            self._defer(priority, job, e.timeout)
+            return False
+        except NetworkError as e:
+            if job.attempts < MAX_ATTEMPTS:
+                self._defer(priority, job, job.attempts)
+                return False
+            self._fail(job, e)
+            return True
+        except Exception as e:
+            # Бот заблокирован, чат не найден и т.п. — повторять бессмысленно
+            self._fail(job, e)
+            return True
+
+        self.sent += 1
+        if not job.future.done():
+            job.future.set_result(result)
+        return True
+
+    def _fail(self, job: SendJob, error: Exception):
+        self.failed += 1
+        logger.warning(f"Не удалось отправить сообщение в чат {job.chat_id}: {error}")
+        if not job.future.done():
+            job.future.set_exception(error)
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers_count)]
+
+    async def close(self, timeout: float = 10.0):
+        """Отправка оставшихся сообщений (не дольше timeout) и остановка воркеров"""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @property
+    def pending(self) -> int:
+        """Сообщения, ещё не отправленные (в очереди, отложенные и в работе)"""
+        return self.queue.qsize() + self._deferred + self._active + self._parked
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queue.qsize(),
+            "deferred": self._deferred,
+            "parked": self._parked,
+            "sent": self.sent,
+            "failed": self.failed,
+        }
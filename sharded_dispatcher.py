@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from aiogram import Bot, Dispatcher, types
+
+logger = logging.getLogger(__name__)
+
+
+def update_shard_key(update: types.Update) -> int:
+    """Ключ упорядочивания: автор апдейта, иначе чат, иначе сам update_id"""
+    for event in (update.message, update.edited_message, update.callback_query,
+                  update.inline_query, update.chosen_inline_result,
+                  update.pre_checkout_query, update.shipping_query, update.my_chat_member):
+        if event is not None and event.from_user is not None:
+            return event.from_user.id
+    for event in (update.channel_post, update.edited_channel_post):
+        if event is not None:
+            return event.chat.id
+    return update.update_id
+
+
+class ShardedDispatcher(Dispatcher):
+    """Диспетчер, раскладывающий апдейты по шардам по пользователю.
+
+    У каждого из shards шардов своя очередь и свой воркер: апдейты одного
+    пользователя обрабатываются строго по порядку (две быстрые ставки не
+    перемешаются), разных пользователей — параллельно. Одновременно
+    выполняется не больше concurrency обработчиков. Если очередь шарда
+    заполнена, апдейт отбрасывается, а не копится в памяти.
+    """
+
+    def __init__(self, bot: Bot, *args, shards: int = 16, concurrency: Optional[int] = None,
+                 shard_queue_size: int = 100, **kwargs):
+        super().__init__(bot, *args, **kwargs)
+        self.shards_count = shards
+        self.concurrency = concurrency or shards
+        self.shard_queue_size = shard_queue_size
+        self.shard_queues: List[asyncio.Queue] = []
+        self._shard_workers: list = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.shed = 0
+
+    def start_shards(self):
+        if not self._shard_workers:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self.shard_queues = [asyncio.Queue(maxsize=self.shard_queue_size)
+                                 for _ in range(self.shards_count)]
+            self._shard_workers = [asyncio.create_task(self._shard_worker(queue))
+                                   for queue in self.shard_queues]
+
+    def submit(self, update: types.Update) -> bool:
+        """Поставить апдейт в очередь его шарда; False — шард перегружен"""
+        self.start_shards()
+        queue = self.shard_queues[update_shard_key(update) % self.shards_count]
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.shed += 1
+            logger.warning(f"⚠️ Шард перегружен, апдейт {update.update_id} отброшен")
+            return False
+        return True
+
+    async def process_updates(self, updates: List[types.Update], fast: bool = True):
+        # Polling: апдейты уходят в шарды, getUpdates не ждёт их обработки
+        for update in updates:
+            self.submit(update)
+        return []
+
+    async def _shard_worker(self, queue: asyncio.Queue):
+        Bot.set_current(self.bot)
+        Dispatcher.set_current(self)
+        while True:
+            update = await queue.get()
+            try:
+                async with self._semaphore:
+                    await self.process_update(update)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки апдейта {update.update_id}: {e}")
+            finally:
+                queue.task_done()
+
+    async def close_shards(self, timeout: float = 10.0):
+        """Дообработать очереди шардов (не дольше timeout) и остановить воркеры"""
+        if not self._shard_workers:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self.shard_queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Не дообработано апдейтов при остановке: {self.shards_pending}")
+        for task in self._shard_workers:
+            task.cancel()
+        await asyncio.gather(*self._shard_workers, return_exceptions=True)
+        self._shard_workers = []
+
+    @property
+    def shards_pending(self) -> int:
+        return sum(q.qsize() for q in self.shard_queues)
+
+    def shard_stats(self) -> Dict[str, int]:
+        return {
+            "shards": self.shards_count,
+            "queued": self.shards_pending,
+            "max_shard_queue": max((q.qsize() for q in self.shard_queues), default=0),
+            "shed": self.shed,
+        }
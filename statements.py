@@ -0,0 +1,62 @@
+import time
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+
+class StatementStats:
+    __slots__ = ("calls", "total", "max")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed: float):
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+
+class StatementRegistry:
+    """Именованные горячие запросы и статистика по ним (только статистика).
+
+    Запросы выполняются по тексту, как и остальные: подготовкой занимается
+    обычный кэш выражений asyncpg, реестр его не настраивает и не прогревает.
+    Свои PreparedStatement из init-хука пула держать нельзя — asyncpg
+    отвергает их после первого возврата соединения в пул. По каждому запросу
+    копятся число вызовов и время выполнения.
+    """
+
+    def __init__(self):
+        self.queries: Dict[str, str] = {}
+        self.stats_by_name: Dict[str, StatementStats] = {}
+
+    def register(self, name: str, query: str) -> str:
+        self.queries[name] = query
+        self.stats_by_name[name] = StatementStats()
+        return name
+
+    async def _run(self, connection, name: str, method: str, args: tuple) -> Any:
+        started = time.perf_counter()
+        try:
+            return await getattr(connection, method)(self.queries[name], *args)
+        finally:
+            self.stats_by_name[name].add(time.perf_counter() - started)
+
+    async def fetchrow(self, connection, name: str, *args) -> Optional[asyncpg.Record]:
+        return await self._run(connection, name, "fetchrow", args)
+
+    async def fetch(self, connection, name: str, *args) -> List[asyncpg.Record]:
+        return await self._run(connection, name, "fetch", args)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                "calls": s.calls,
+                "avg_ms": s.total / s.calls * 1000 if s.calls else 0.0,
+                "max_ms": s.max * 1000,
+            }
+            for name, s in self.stats_by_name.items()
+        }
@@ -3,6 +3,8 @@ from typing import Optional, Any, Dict
 from redis import asyncio as aioredis
 from aiogram.contrib.fsm_storage.redis import RedisStorage2
 
+from config import REDIS_HOST, REDIS_PORT, REDIS_DB
+
 class CustomRedisStorage(RedisStorage2):
     async def get_data(self, chat=None, user=None, default=None):
         data = await super().get_data(chat=chat, user=user, default=default)
@@ -17,9 +19,9 @@ class CustomRedisStorage(RedisStorage2):
 def get_redis_storage():
     """Создание Redis storage с настройками безопасности"""
     return CustomRedisStorage(
-        host='localhost',
-        port=6379,
-        db=0,
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
         password=None,  # Если нужен пароль
         prefix='auction_fsm',
         state_ttl=3600,  # 1 час
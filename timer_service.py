@@ -0,0 +1,121 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Максимальный сон планировщика: защита от перевода системных часов
+MAX_SLEEP_SECONDS = 60.0
+
+TimerCallback = Callable[[], Awaitable[Any]]
+
+
+def to_local_naive(when: datetime.datetime) -> datetime.datetime:
+    """Приведение времени к локальному naive (как TIMESTAMP в БД)"""
+    if when.tzinfo is not None:
+        return when.astimezone().replace(tzinfo=None)
+    return when
+
+
+class TimerService:
+    """Таймеры на куче: точный запуск в заданный момент, перенос за O(log n).
+
+    При переносе в кучу кладётся новая запись, а старая помечается
+    устаревшей и отбрасывается при извлечении (ленивое удаление).
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime.datetime, int, Hashable]] = []
+        self._entries: Dict[Hashable, Tuple[datetime.datetime, int, TimerCallback]] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def schedule(self, key: Hashable, when: datetime.datetime, callback: TimerCallback):
+        """Поставить или перенести таймер key на момент when"""
+        when = to_local_naive(when)
+        seq = next(self._seq)
+        self._entries[key] = (when, seq, callback)
+        heapq.heappush(self._heap, (when, seq, key))
+        self._compact()
+        if self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    def cancel(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def when(self, key: Hashable) -> Optional[datetime.datetime]:
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def _compact(self):
+        # Не даём устаревшим записям разрастить кучу больше чем вдвое
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._entries):
+            self._heap = [(when, seq, key) for key, (when, seq, _) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now: datetime.datetime) -> List[Tuple[Hashable, TimerCallback]]:
+        due = []
+        while self._heap:
+            when, seq, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != seq:
+                heapq.heappop(self._heap)
+                continue
+            if when > now:
+                break
+            heapq.heappop(self._heap)
+            del self._entries[key]
+            due.append((key, entry[2]))
+        return due
+
+    def _next_delay(self, now: datetime.datetime) -> Optional[float]:
+        while self._heap:
+            when, seq, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != seq:
+                heapq.heappop(self._heap)
+                continue
+            return min(max((when - now).total_seconds(), 0.0), MAX_SLEEP_SECONDS)
+        return None
+
+    async def _run(self):
+        while True:
+            now = datetime.datetime.now()
+            for key, callback in self._pop_due(now):
+                task = asyncio.create_task(self._fire(key, callback))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+            delay = self._next_delay(datetime.datetime.now())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, key: Hashable, callback: TimerCallback):
+        try:
+            await callback()
+        except Exception as e:
+            logger.error(f"❌ Ошибка таймера {key}: {e}")
+
+    def start(self):
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановка планировщика и ожидание сработавших таймеров"""
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
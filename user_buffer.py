@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед повтором после ошибки записи
+FLUSH_RETRY_DELAY = 1.0
+
+
+class UserWriteBuffer:
+    """Отложенная пакетная регистрация пользователей.
+
+    register() не ходит в БД: если имя пользователя совпадает с уже
+    записанным, вызов ничего не делает, иначе пользователь попадает в буфер.
+    Буфер сбрасывается одним многострочным upsert раз в flush_interval секунд
+    или сразу, как только в нём набралось max_batch записей. close()
+    дописывает остаток.
+    """
+
+    def __init__(self, write: Callable[[List[Tuple[int, str]]], Awaitable[None]],
+                 flush_interval: float = 1.0, max_batch: int = 1000, known_size: int = 100000):
+        self.write = write
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.known_size = known_size
+        # Что уже записано в БД (LRU): user_id -> user_name
+        self.known: "OrderedDict[int, str]" = OrderedDict()
+        self.pending: Dict[int, str] = {}
+        # Пакет, который сейчас пишется в БД
+        self._in_flight: Dict[int, str] = {}
+        self.skipped = 0
+        self.written = 0
+        self.batches = 0
+        self._lock = asyncio.Lock()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, user_id: int, user_name: str):
+        if self.pending.get(user_id, self.known.get(user_id)) == user_name:
+            self.skipped += 1
+            if user_id in self.known:
+                self.known.move_to_end(user_id)
+            return
+        self.pending[user_id] = user_name
+        if len(self.pending) >= self.max_batch:
+            self._full.set()
+
+    def _remember(self, batch: List[Tuple[int, str]]):
+        for user_id, user_name in batch:
+            self.known[user_id] = user_name
+            self.known.move_to_end(user_id)
+        while len(self.known) > self.known_size:
+            self.known.popitem(last=False)
+
+    async def flush(self):
+        """Записать всех накопленных пользователей одним запросом"""
+        async with self._lock:
+            if not self.pending:
+                return
+            batch = list(self.pending.items())
+            self._in_flight, self.pending = self.pending, {}
+            try:
+                await self.write(batch)
+            except BaseException:
+                # Вернём пакет в буфер (в том числе при отмене), не затирая более свежие имена
+                for user_id, user_name in batch:
+                    self.pending.setdefault(user_id, user_name)
+                raise
+            finally:
+                self._in_flight = {}
+            self._remember(batch)
+            self.written += len(batch)
+            self.batches += 1
+
+    async def flush_user(self, user_id: int):
+        """Дождаться записи пользователя, если он ещё в буфере или пишется прямо сейчас"""
+        if user_id in self.pending or user_id in self._in_flight:
+            # flush() ждёт текущую запись на блокировке и дописывает пакет, если она не удалась
+            await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи {len(self.pending)} пользователей, повтор: {e}")
+                await asyncio.sleep(FLUSH_RETRY_DELAY)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Остановка фоновой записи и сброс остатка"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self.pending),
+            "known": len(self.known),
+            "skipped": self.skipped,
+            "written": self.written,
+            "batches": self.batches,
+        }
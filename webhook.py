@@ -1,7 +1,201 @@
+import json
 import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+from aiogram import Bot, Dispatcher, types
+from aiohttp import web
+
+from payment import verify_signature
+from payment_flow import PaymentFlow
+from sharded_dispatcher import ShardedDispatcher
 
 logger = logging.getLogger(__name__)
 
-async def run_webhook():
-    logger.info("🌐 Вебхук-сервер (режим заглушки)")
-    return True
+PAYMENT_WEBHOOK_PATH = "/payments/webhook"
+SIGNATURE_HEADER = "X-Signature"
+TELEGRAM_SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+async def handle_payment_notification(request: web.Request) -> web.Response:
+    """Уведомление провайдера о смене статуса платежа"""
+    body = await request.read()
+    if not verify_signature(body, request.headers.get(SIGNATURE_HEADER, ""), request.app["secret"]):
+        logger.warning(f"🚫 Уведомление о платеже с неверной подписью от {request.remote}")
+        return web.json_response({"ok": False, "error": "bad signature"}, status=401)
+
+    try:
+        data = json.loads(body)
+        payment_id = str(data["payment_id"])
+        status = str(data["status"])
+    except (ValueError, KeyError, TypeError):
+        return web.json_response({"ok": False, "error": "bad payload"}, status=400)
+
+    # Повторная доставка того же события ничего не меняет: переход условный
+    flow: PaymentFlow = request.app["flow"]
+    try:
+        changed = await flow.on_status(payment_id, status)
+    except Exception as e:
+        logger.error(f"❌ Ошибка обработки уведомления о платеже {payment_id}: {e}")
+        # 5xx — провайдер повторит доставку
+        return web.json_response({"ok": False}, status=500)
+
+    logger.info(f"🌐 Уведомление о платеже {payment_id}: {status} (изменён: {changed})")
+    return web.json_response({"ok": True, "changed": changed})
+
+
+def create_payment_app(flow: PaymentFlow, secret: str) -> web.Application:
+    app = web.Application()
+    app["flow"] = flow
+    app["secret"] = secret
+    app.router.add_post(PAYMENT_WEBHOOK_PATH, handle_payment_notification)
+    return app
+
+
+async def run_webhook(flow: PaymentFlow, secret: str, host: str = "0.0.0.0",
+                      port: int = 8080) -> Optional[web.AppRunner]:
+    """Запуск HTTP-сервера для уведомлений платёжного провайдера"""
+    if not secret:
+        logger.warning("🌐 PAYMENT_WEBHOOK_SECRET не задан — вебхук платежей отключён")
+        return None
+
+    runner = web.AppRunner(create_payment_app(flow, secret))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"🌐 Вебхук платежей: http://{host}:{port}{PAYMENT_WEBHOOK_PATH}")
+    return runner
+
+
+class UpdateIngestor:
+    """Приём апдейтов Telegram через вебхук.
+
+    HTTP-ответ отдаётся сразу после постановки апдейта в очередь шарда
+    диспетчера. Повторная доставка того же update_id (Telegram повторяет при
+    таймаутах и 5xx) отбрасывается по окну последних dedup_size
+    идентификаторов. При перегрузке шарда отвечаем 503 — Telegram доставит
+    апдейт позже.
+    """
+
+    def __init__(self, dp: ShardedDispatcher, dedup_size: int = 10000):
+        self.dp = dp
+        self.dedup_size = dedup_size
+        self.seen: "OrderedDict[int, None]" = OrderedDict()
+        self.accepting = False
+        self.accepted = 0
+        self.duplicates = 0
+        self.rejected = 0
+
+    def offer(self, data: Dict[str, Any]) -> int:
+        """Поставить апдейт в обработку; возвращает HTTP-статус ответа Telegram"""
+        if not self.accepting:
+            return 503
+
+        update_id = data.get("update_id")
+        if not isinstance(update_id, int):
+            return 400
+        if update_id in self.seen:
+            self.duplicates += 1
+            return 200
+
+        if not self.dp.submit(types.Update(**data)):
+            self.rejected += 1
+            return 503
+
+        self.seen[update_id] = None
+        if len(self.seen) > self.dedup_size:
+            self.seen.popitem(last=False)
+        self.accepted += 1
+        return 200
+
+    def start(self):
+        self.dp.start_shards()
+        self.accepting = True
+
+    def close(self):
+        """Перестать принимать апдейты; очереди шардов дообрабатывает on_shutdown"""
+        self.accepting = False
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+        }
+
+
+async def handle_update(request: web.Request) -> web.Response:
+    """Апдейт от Telegram"""
+    secret = request.app["secret"]
+    if secret and request.headers.get(TELEGRAM_SECRET_HEADER) != secret:
+        return web.Response(status=401)
+
+    try:
+        data = await request.json()
+    except ValueError:
+        return web.Response(status=400)
+    if not isinstance(data, dict):
+        return web.Response(status=400)
+
+    return web.Response(status=request.app["ingestor"].offer(data))
+
+
+def run_updates_webhook(dp: ShardedDispatcher, url: str, path: str, secret: str = "",
+                        host: str = "0.0.0.0", port: int = 8443,
+                        on_startup: Optional[Callable[[Dispatcher], Awaitable[None]]] = None,
+                        on_shutdown: Optional[Callable[[Dispatcher], Awaitable[None]]] = None):
+    """Запуск бота в режиме вебхука (вместо executor.start_polling)"""
+    ingestor = UpdateIngestor(dp)
+    dp['update_ingestor'] = ingestor
+
+    app = web.Application()
+    app["ingestor"] = ingestor
+    app["secret"] = secret
+    app.router.add_post(path, handle_update)
+
+    async def startup(app: web.Application):
+        Bot.set_current(dp.bot)
+        Dispatcher.set_current(dp)
+        if on_startup is not None:
+            await on_startup(dp)
+        ingestor.start()
+        await dp.bot.set_webhook(url + path, secret_token=secret or None,
+                                 max_connections=dp.shards_count)
+        logger.info(f"🌐 Вебхук апдейтов: {url}{path}")
+
+    async def shutdown(app: web.Application):
+        # Новые апдейты получат 503 и будут доставлены снова после перезапуска
+        ingestor.close()
+        if on_shutdown is not None:
+            await on_shutdown(dp)
+
+    app.on_startup.append(startup)
+    app.on_shutdown.append(shutdown)
+    web.run_app(app, host=host, port=port)
+
+
+def fake_message_update(update_id: int, user_id: int, text: str) -> Dict[str, Any]:
+    """Минимальный апдейт с текстовым сообщением пользователя"""
+    user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+            "from": user,
+            "text": text,
+        },
+    }
+
+
+async def send_fake_update(webhook_url: str, update: Dict[str, Any], secret: str = "",
+                           session: Optional[aiohttp.ClientSession] = None) -> int:
+    """Локальный «Telegram»: доставка апдейта на наш вебхук"""
+    headers = {TELEGRAM_SECRET_HEADER: secret} if secret else {}
+    if session is None:
+        async with aiohttp.ClientSession() as own_session:
+            return await send_fake_update(webhook_url, update, secret, own_session)
+    async with session.post(webhook_url, json=update, headers=headers) as response:
+        return response.status